@@ -46,9 +46,9 @@ function message = matpybias(irumatfile,plotopt)
 % CAP 891, 09/19/2003, uplinked 2003:274:13:19:00
 % YrMat(1) = 2003 + (274 + 13/24 + 19/1440 - 1)/365.0;
   MmatJ2000sec(1) = (datenum([2003 1 274 13 19 0]) - datenum([2000 1 1 12 0 0]))*86400.0;
-  Mmat{1} = [ 3.3203451E-6 -1.3894030E-4 -3.8983014E-5
-              9.3199606E-5 -1.3754384E-5  4.5790156E-6
-              1.3764573E-5  9.8274797E-6  3.3727364E-6 ];
+  Mmat{1} = [ 3.3203451E-6  9.3199606E-5  1.3764573E-5
+             -1.3894030E-4 -1.3754384E-5  9.8274797E-6
+             -3.8983014E-5  4.5790156E-6  3.3727364E-6 ];
 % CAP 1021, 12/13/2006, uplinked 2006:352:14:50:00
 % YrMat(2) = 2006 + (352 + 14/24 + 50/1440 - 1)/365.0;
   MmatJ2000sec(2) = (datenum([2006 1 352 14 50 0]) - datenum([2000 1 1 12 0 0]))*86400.0;
@@ -57,7 +57,7 @@ function message = matpybias(irumatfile,plotopt)
              -0.477453e-04  0.168878e-04  0.679124e-04 ];
 % Matrix Patch Request #: 283, uplinked 2010:350:22:10:00
 % YrMat(3) = 2010 + (350 + 22/24 + 10/1440 - 1)/365.0;
-  MmatJ2000sec(3) = (datenum([2010 1 350 22 0 0]) - datenum([2000 1 1 12 0 0]))*86400.0;
+  MmatJ2000sec(3) = (datenum([2010 1 350 22 10 0]) - datenum([2000 1 1 12 0 0]))*86400.0;
   Mmat{3} = [ 8.792448e-05  1.409469e-04  3.321078e-05
              -1.200405e-04  9.856613e-05  2.051482e-05
              -3.014042e-05  2.017329e-05  1.311966e-04 ];
@@ -6,15 +6,16 @@ Describe what this does.
 """
 import argparse
 import pprint
+import multiprocessing
 
-import matplotlib.pyplot as plt
 import numpy as np
 
-import Ska.engarchive.fetch as fetch
-from Ska.Matplotlib import plot_cxctime
 from Chandra.Time import DateTime
 
-from arraydata import getstrstartstop
+from arraydata import StateRuns, IntervalSet
+from fetchcache import FetchCache
+import plotbundle
+from plotbundle import PlotBundle
 
 
 def get_opt():
@@ -49,9 +50,29 @@ def get_opt():
     parser.add_argument('--filter-rwbi-disable', type=str,
                         default='True',
                         help='Remove RW bias disable (SCS-107) (default=True)')
+    parser.add_argument('--chunk-days', type=float,
+                        default=0.0,
+                        help='Process telemetry in chunks of this many days, e.g. 30 for '
+                             'surveys of years, 0 for all at once (default=0)')
     parser.add_argument('--save-plots', type=str,
                         default='False',
-                        help='Write plots to png files (default=False)')
+                        help='Write plots to png files with the Agg renderer (default=False)')
+    parser.add_argument('--show-plots', type=str,
+                        default='True',
+                        help='Draw plots in pyplot windows for review (default=True)')
+    parser.add_argument('--plot-bundle', type=str,
+                        default='',
+                        help='File to keep the plot data in, for plotbundle.py '
+                             '(default=no file)')
+    parser.add_argument('--num-proc', type=int,
+                        default=multiprocessing.cpu_count(),
+                        help='Number of processes for writing plots (default=number of CPUs)')
+    parser.add_argument('--fetch-cache', type=str,
+                        default='',
+                        help='Telemetry cache directory (default=no cache)')
+    parser.add_argument('--fetch-cache-size', type=float,
+                        default=5.0,
+                        help='Maximum size of telemetry cache (GB, default=5)')
     opt = parser.parse_args()
     return opt
 
@@ -82,151 +103,68 @@ adj_mups_dump = string_to_bool(opt.adj_mups_dump)
 filter_mups_dump = string_to_bool(opt.filter_mups_dump)
 filter_rwbi_disable = string_to_bool(opt.filter_rwbi_disable)
 save_plots = string_to_bool(opt.save_plots)
+show_plots = string_to_bool(opt.show_plots)
+if opt.fetch_cache:
+    fetcher = FetchCache(opt.fetch_cache, opt.fetch_cache_size * 1e9)
+else:
+    import Ska.engarchive.fetch as fetch
+    fetcher = fetch
 
 # Start processing
 print 'Running aoatter.py with options:'
 pprint.pprint(vars(opt))
-
-# Read PCAD mode flag and get NPNT & NMAN start and stop times
 print 'Requested time interval is %s to %s' % (tstart, tstop)
-print 'Fetch AOPCADMD and AOACASEQ'
-data = fetch.MSIDset(['AOPCADMD', 'AOACASEQ'], tstart, tstop, filter_bad=True)
-aopcadmd_vals = np.array(data['AOPCADMD'].vals)
-aopcadmd_times = data['AOPCADMD'].times[0:]
-print 'PCAD mode times %s to %s' % (DateTime(aopcadmd_times[0]).date,
-                                    DateTime(aopcadmd_times[-1]).date)
-aoacaseq_vals = np.array(data['AOACASEQ'].vals)
-aoacaseq_times = data['AOACASEQ'].times[0:]
-(npnt_indices, npnt_times) = getstrstartstop(aopcadmd_vals, aopcadmd_times, 'NPNT')
+
+# Time spans of telemetry processed at once, the whole interval or chunks of
+# chunk_days; only one chunk of AOATTER is in memory at a time
+tstart_secs = DateTime(tstart).secs
+tstop_secs = DateTime(tstop).secs
+if (opt.chunk_days > 0.0):
+    chunk_starts = np.arange(tstart_secs, tstop_secs, opt.chunk_days * 86400.0)
+else:
+    chunk_starts = np.array([tstart_secs])
+chunk_stops = np.append(chunk_starts[1:], tstop_secs)
+print 'Number of time chunks = %d' % chunk_starts.shape[0]
+
+# Read PCAD mode flag, ACA sequence, momentum unload & RW bias flags, and get
+# start and stop times of NPNT, NMAN, KALM, GRND and DISA, run by run
+print 'Fetch AOPCADMD, AOACASEQ, AOUNLOAD, and AORWBIAS'
+state_msids = ['AOPCADMD', 'AOACASEQ', 'AOUNLOAD', 'AORWBIAS']
+state_runs = dict((msid, StateRuns()) for msid in state_msids)
+for (chunk_start, chunk_stop) in zip(chunk_starts, chunk_stops):
+    data = fetcher.MSIDset(state_msids, chunk_start, chunk_stop, filter_bad=True)
+    for msid in state_msids:
+        state_runs[msid].add(np.array(data[msid].vals), data[msid].times)
+print 'PCAD mode times %s to %s' % (DateTime(state_runs['AOPCADMD'].tfirst).date,
+                                    DateTime(state_runs['AOPCADMD'].tlast).date)
+pcadmd_states = state_runs['AOPCADMD'].startstop(['NPNT', 'NMAN'])
+npnt_times = pcadmd_states['NPNT']
 npnt_num = npnt_times.shape[1]
 print 'NPNT number = %d' % npnt_num
-(nman_indices, nman_times) = getstrstartstop(aopcadmd_vals, aopcadmd_times, 'NMAN')
+nman_times = pcadmd_states['NMAN']
 nman_num = nman_times.shape[1]
 print 'NMAN number = %d' % nman_num
-(kalm_indices, kalm_times) = getstrstartstop(aoacaseq_vals, aoacaseq_times, 'KALM')
-kalm_num = kalm_indices.shape[1]
+kalm_times = state_runs['AOACASEQ'].startstop(['KALM'])['KALM']
+kalm_num = kalm_times.shape[1]
 print 'KALMAN number = %d' % kalm_num
 
-# Adjust start time of NPNT to KALM time, if present
-kalm_time_in_npnt = np.zeros(kalm_num, dtype=bool)
+# Adjust start time of NPNT to last KALM start time within NPNT, if present
 if adj_kalm:
-    for n in range(npnt_num):
-        kalm_time_in_npnt = ((npnt_times[0, n] < kalm_times[0, :])
-                             & (kalm_times[0, :] < npnt_times[1, n]))
-        if kalm_time_in_npnt.any():
-            npnt_times[0, n] = kalm_times[0, kalm_time_in_npnt].max() + opt.settle_time
-
-# Read PCAD attitude errors and times, compute YZ error
-print 'Fetch AOATTER1, AOATTER2, and AOATTER3'
-data = fetch.MSIDset(['AOATTER1', 'AOATTER2', 'AOATTER3'], tstart, tstop, filter_bad=True)
-aoatter = np.array([data['AOATTER1'].times[0:],  # time of attitude error
-                    data['AOATTER1'].vals,  # roll attitude error
-                    data['AOATTER2'].vals,  # pitch attitude error
-                    data['AOATTER3'].vals])  # yaw attitude error
-print 'Attitude error times %s to %s' % (DateTime(aoatter[0, 0]).date,
-                                         DateTime(aoatter[0, -1]).date)
-aoatter_num = aoatter.shape[1]
-print 'AOATTER number = %d' % aoatter_num
-aoatteryz = np.sqrt(aoatter[2, :] ** 2 + aoatter[3, :] ** 2)
-
-plt.figure(1)
-plt.clf()
-plt.title('YZ Attitude Error, NMAN & NPNT')
-plt.xlabel('Time')
-plt.ylabel('Attitude Err (arcsec)')
-plot_cxctime(aoatter[0, :], aoatteryz * 180.0 / np.pi * 3600, '.r')
-plt.grid('on')
-plt.draw()
-plt.show(block=False)
-if save_plots:
-    plt.savefig('YZ_Attitude_Error_{}-{}-{}.png'
-                .format(tstart[0:4], tstart[5:8], tstart[9:11]))
-
-# Find aoatter in NPNT
-aoatter_after_npnt_start = np.zeros(aoatter_num, dtype=bool)  # pre-allocate array
-aoatter_before_npnt_stop = np.zeros(aoatter_num, dtype=bool)  # pre-allocate array
-aoatter_in_npnt = np.zeros(aoatter_num, dtype=bool)  # pre-allocate array
-for n in range(npnt_num):
-    aoatter_after_npnt_start = (aoatter[0, :] >= npnt_times[0, n])
-    aoatter_before_npnt_stop = (aoatter[0, :] <= npnt_times[1, n])
-    aoatter_in_npnt = aoatter_in_npnt | (aoatter_after_npnt_start & aoatter_before_npnt_stop)
-print 'Number of aoatter in NPNT = %d' % aoatter_in_npnt.sum()
-
-plt.figure(2)
-plt.clf()
-plt.title('YZ Attitude Error during NPNT')
-plt.xlabel('Time')
-plt.ylabel('Attitude Err (arcsec)')
-plot_cxctime(aoatter[0, aoatter_in_npnt], aoatteryz[aoatter_in_npnt] * 180.0 / np.pi * 3600, '.r')
-plt.grid('on')
-plt.draw()
-plt.show(block=False)
-if save_plots:
-    plt.savefig('YZ_Attitude_Error_NPNT_{}-{}-{}.png'
-                .format(tstart[0:4], tstart[5:8], tstart[9:11]))
+    kalm_lo = np.searchsorted(kalm_times[0, :], npnt_times[0, :], 'right')
+    kalm_hi = np.searchsorted(kalm_times[0, :], npnt_times[1, :], 'left')
+    kalm_in_npnt = (kalm_hi > kalm_lo)
+    npnt_times[0, kalm_in_npnt] = kalm_times[0, kalm_hi[kalm_in_npnt] - 1] + opt.settle_time
 
-# Get data for mups dump and RW bias disable
-print 'Fetch AOUNLOAD, and AORWBIAS'
-data = fetch.MSIDset(['AOUNLOAD', 'AORWBIAS'], tstart, tstop, filter_bad=True)
-aounload_vals = np.array(data['AOUNLOAD'].vals)
-aounload_times = data['AOUNLOAD'].times[0:]
-aorwbias_vals = np.array(data['AORWBIAS'].vals)
-aorwbias_times = data['AORWBIAS'].times[0:]
-(dump_indices, dump_times) = getstrstartstop(aounload_vals, aounload_times, 'GRND')
-dump_num = dump_indices.shape[1]
+dump_times = state_runs['AOUNLOAD'].startstop(['GRND'])['GRND']
+dump_num = dump_times.shape[1]
 print 'Number of momentum dumps = %d' % dump_num
 # Adjust  MUPS firing end time to remove damping motion
 if adj_mups_dump:
     dump_times[1, :] = dump_times[1, :] + opt.dump_damp
-(rwbi_indices, rwbi_times) = getstrstartstop(aorwbias_vals, aorwbias_times, 'DISA')
-rwbi_num = rwbi_indices.shape[1]
+rwbi_times = state_runs['AORWBIAS'].startstop(['DISA'])['DISA']
+rwbi_num = rwbi_times.shape[1]
 print 'Number of RW bias disables = %d' % rwbi_num
 
-# Find aoatter in mups dump
-aoatter_after_dump_start = np.zeros(aoatter_num, dtype=bool)  # pre-allocate array
-aoatter_before_dump_stop = np.zeros(aoatter_num, dtype=bool)  # pre-allocate array
-aoatter_in_dump = np.zeros(aoatter_num, dtype=bool)  # pre-allocate array
-if filter_mups_dump:
-    if (dump_num > 0):
-        for n in range(dump_num):
-            aoatter_after_dump_start = (aoatter[0, :] >= dump_times[0, n])
-            aoatter_before_dump_stop = (aoatter[0, :] <= dump_times[1, n])
-            aoatter_in_dump = aoatter_in_dump | (aoatter_after_dump_start &
-                                                 aoatter_before_dump_stop)
-        print 'Number of aoatter during dumps = %d' % aoatter_in_dump.sum()
-
-# Find aoatter in RW bias disable
-aoatter_after_disa_start = np.zeros(aoatter_num, dtype=bool)  # pre-allocate array
-aoatter_before_disa_stop = np.zeros(aoatter_num, dtype=bool)  # pre-allocate array
-aoatter_in_disa = np.zeros(aoatter_num, dtype=bool)  # pre-allocate array
-if filter_rwbi_disable:
-    if (rwbi_num > 0):
-        for n in range(rwbi_num):
-            aoatter_after_disa_start = (aoatter[0, :] >= rwbi_times[0, n])
-            aoatter_before_disa_stop = (aoatter[0, :] <= rwbi_times[1, n])
-            aoatter_in_disa = aoatter_in_disa | (aoatter_after_disa_start &
-                                                 aoatter_before_disa_stop)
-        print 'Number of aoatter during RW bias disable = %d' % aoatter_in_disa.sum()
-
-# Get filtered aoatter data
-aoatter_filter = aoatter_in_npnt & (~ aoatter_in_dump) & (~ aoatter_in_disa)
-print 'Number of aoatter in NPNT & not in dump or disable = %d' % aoatter_filter.sum()
-
-plt.figure(3)
-plt.clf()
-plt.title('Attitude Error Filtered for MUPS Dump & RW Bias DISA')
-plt.xlabel('Time')
-plt.ylabel('Attitude Err (arcsec)')
-plot_cxctime(aoatter[0, aoatter_filter], aoatteryz[aoatter_filter] * 180.0 / np.pi * 3600, '.r')
-plt.grid('on')
-plt.draw()
-plt.show(block=False)
-if save_plots:
-    plt.savefig('YZ_Attitude_Error_Filtered_More_{}-{}-{}.png'
-                .format(tstart[0:4], tstart[5:8], tstart[9:11]))
-
-# sys.exit(0)
-
 if filter_aoatter_bad_times:
     textin = open('aoatter_bad_times.dat', 'rU').readlines()
     timelist = [x.split() for x in textin]
@@ -236,28 +174,104 @@ if filter_aoatter_bad_times:
     bad_times = np.zeros((2, num_bad))
     bad_times[0, :] = DateTime(startstr).secs
     bad_times[1, :] = DateTime(stopstr).secs
-    aoatter_after_bad_start = np.zeros(aoatter_num, dtype=bool)  # pre-allocate array
-    aoatter_before_bad_stop = np.zeros(aoatter_num, dtype=bool)  # pre-allocate array
-    aoatter_in_bad = np.zeros(aoatter_num, dtype=bool)  # pre-allocate array
-    for n in range(num_bad):
-        aoatter_after_bad_start = (aoatter[0, :] >= bad_times[0, n])
-        aoatter_before_bad_stop = (aoatter[0, :] <= bad_times[1, n])
-        aoatter_in_bad = aoatter_in_bad | (aoatter_after_bad_start & aoatter_before_bad_stop)
-    print 'Number of aoatter in bad = %d' % aoatter_in_bad.sum()
-    aoatter_filter = aoatter_filter & (~ aoatter_in_bad)
 
-plt.figure(4)
-plt.clf()
-plt.title('Attitude Error Filtered with Bad Times File')
-plt.xlabel('Time')
-plt.ylabel('Attitude Err (arcsec)')
-plot_cxctime(aoatter[0, aoatter_filter], aoatteryz[aoatter_filter] * 180.0 / np.pi * 3600, '.r')
-plt.grid('on')
-plt.draw()
-plt.show(block=False)
+# Sets of intervals for masks of AOATTER samples, one searchsorted pass each
+npnt_set = IntervalSet(npnt_times)
+dump_set = IntervalSet(dump_times)
+rwbi_set = IntervalSet(rwbi_times)
+if filter_aoatter_bad_times:
+    bad_set = IntervalSet(bad_times)
+
+# Figures are collected in a plot bundle and drawn when processing is done;
+# series are added for each chunk
+bundle = PlotBundle()
+datestr = '{}-{}-{}'.format(tstart[0:4], tstart[5:8], tstart[9:11])
+bundle.figure(1, 'YZ_Attitude_Error_{}.png'.format(datestr),
+              'YZ Attitude Error, NMAN & NPNT', 'Time', 'Attitude Err (arcsec)')
+bundle.figure(2, 'YZ_Attitude_Error_NPNT_{}.png'.format(datestr),
+              'YZ Attitude Error during NPNT', 'Time', 'Attitude Err (arcsec)')
+bundle.figure(3, 'YZ_Attitude_Error_Filtered_More_{}.png'.format(datestr),
+              'Attitude Error Filtered for MUPS Dump & RW Bias DISA', 'Time', 'Attitude Err (arcsec)')
+bundle.figure(4, 'YZ_Attitude_Error_Filtered_Even_More_{}.png'.format(datestr),
+              'Attitude Error Filtered with Bad Times File', 'Time', 'Attitude Err (arcsec)')
+
+# Read PCAD attitude errors and times, compute YZ error and find attitude
+# errors in NPNT, mups dump, RW bias disable and bad times, chunk by chunk
+print 'Fetch AOATTER1, AOATTER2, and AOATTER3'
+aoatter_first = None
+aoatter_last = None
+aoatter_num = 0
+aoatter_in_npnt_num = 0
+aoatter_in_dump_num = 0
+aoatter_in_disa_num = 0
+aoatter_filter_num = 0
+aoatter_in_bad_num = 0
+for (chunk_start, chunk_stop) in zip(chunk_starts, chunk_stops):
+    data = fetcher.MSIDset(['AOATTER1', 'AOATTER2', 'AOATTER3'], chunk_start, chunk_stop,
+                           filter_bad=True)
+    aoatter = np.array([data['AOATTER1'].times[0:],  # time of attitude error
+                        data['AOATTER1'].vals,  # roll attitude error
+                        data['AOATTER2'].vals,  # pitch attitude error
+                        data['AOATTER3'].vals])  # yaw attitude error
+    if (aoatter.shape[1] == 0):
+        continue
+    if aoatter_first is None:
+        aoatter_first = aoatter[0, 0]
+    aoatter_last = aoatter[0, -1]
+    aoatter_num += aoatter.shape[1]
+    aoatteryz = np.sqrt(aoatter[2, :] ** 2 + aoatter[3, :] ** 2)
+    bundle.plot_cxctime(aoatter[0, :], aoatteryz * 180.0 / np.pi * 3600, '.r', fig=0)
+
+#   Find aoatter in NPNT
+    aoatter_in_npnt = npnt_set.pointsin(aoatter[0, :])
+    aoatter_in_npnt_num += aoatter_in_npnt.sum()
+    bundle.plot_cxctime(aoatter[0, aoatter_in_npnt], aoatteryz[aoatter_in_npnt] * 180.0 / np.pi * 3600,
+                        '.r', fig=1)
+
+#   Find aoatter in mups dump and RW bias disable
+    aoatter_in_dump = np.zeros(aoatter.shape[1], dtype=bool)
+    if filter_mups_dump:
+        aoatter_in_dump = dump_set.pointsin(aoatter[0, :])
+        aoatter_in_dump_num += aoatter_in_dump.sum()
+    aoatter_in_disa = np.zeros(aoatter.shape[1], dtype=bool)
+    if filter_rwbi_disable:
+        aoatter_in_disa = rwbi_set.pointsin(aoatter[0, :])
+        aoatter_in_disa_num += aoatter_in_disa.sum()
+
+#   Get filtered aoatter data
+    aoatter_filter = aoatter_in_npnt & (~ aoatter_in_dump) & (~ aoatter_in_disa)
+    aoatter_filter_num += aoatter_filter.sum()
+    bundle.plot_cxctime(aoatter[0, aoatter_filter], aoatteryz[aoatter_filter] * 180.0 / np.pi * 3600,
+                        '.r', fig=2)
+
+    if filter_aoatter_bad_times:
+        aoatter_in_bad = bad_set.pointsin(aoatter[0, :])
+        aoatter_in_bad_num += aoatter_in_bad.sum()
+        aoatter_filter = aoatter_filter & (~ aoatter_in_bad)
+
+#   full resolution, for start & stop times of bad time spans, unless in chunks
+    bundle.plot_cxctime(aoatter[0, aoatter_filter], aoatteryz[aoatter_filter] * 180.0 / np.pi * 3600,
+                        '.r', decim=(opt.chunk_days > 0.0), fig=3)
+
+if aoatter_first is not None:
+    print 'Attitude error times %s to %s' % (DateTime(aoatter_first).date,
+                                             DateTime(aoatter_last).date)
+print 'AOATTER number = %d' % aoatter_num
+print 'Number of aoatter in NPNT = %d' % aoatter_in_npnt_num
+if filter_mups_dump and (dump_num > 0):
+    print 'Number of aoatter during dumps = %d' % aoatter_in_dump_num
+if filter_rwbi_disable and (rwbi_num > 0):
+    print 'Number of aoatter during RW bias disable = %d' % aoatter_in_disa_num
+print 'Number of aoatter in NPNT & not in dump or disable = %d' % aoatter_filter_num
+if filter_aoatter_bad_times:
+    print 'Number of aoatter in bad = %d' % aoatter_in_bad_num
+
+if opt.plot_bundle:
+    bundle.save(opt.plot_bundle)
+    print 'Plot bundle = %s' % opt.plot_bundle
 if save_plots:
-    plt.savefig('YZ_Attitude_Error_Filtered_Even_More_{}-{}-{}.png'
-                .format(tstart[0:4], tstart[5:8], tstart[9:11]))
+    plotbundle.render(bundle, opt.num_proc)
+if show_plots:
+    plotbundle.show(bundle)
 
 print 'Done!'
-
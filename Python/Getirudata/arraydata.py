@@ -1,6 +1,72 @@
-import Ska.Numpy
-from pylab import *
-import Chandra.Time
+import numpy as np
+
+def staterle(data_vals):
+    """Function to run-length encode a state MSID in a single pass.
+    Input:
+    data_vals : np.array of strings (or any values comparable with ==)
+    Output:
+    run_vals  : np.array(nrun,) of state value of each run
+    run_codes : int np.array(nrun,) of integer code of each run, index into states
+    states    : np.array(nstate,) of sorted distinct state values
+    run_start : int np.array(nrun,) of first index of each run
+    run_stop  : int np.array(nrun,) of last index of each run"""
+    numdata = data_vals.shape[0]
+    if (numdata == 0):
+        empty = np.zeros(0, dtype=int)
+        return (data_vals, empty, np.unique(data_vals), empty, empty)
+    change = np.flatnonzero(data_vals[1:] != data_vals[:-1]) + 1
+    run_start = np.concatenate(([0], change)).astype(int)
+    run_stop = np.concatenate((change - 1, [numdata - 1])).astype(int)
+    run_vals = data_vals[run_start]
+    (states, run_codes) = np.unique(run_vals, return_inverse=True)
+    return (run_vals, run_codes, states, run_start, run_stop)
+
+def getstatestartstop(data_vals, data_times, strvals=None):
+    """Function to find the start and stop times of every state of a state MSID
+    in one pass, see getstrstartstop for the start and stop rules (a run of one
+    sample at the first or last index is not used).
+    Input:
+    data_vals  : np.array of strings;
+    data_times : np.array of floats; same size as data_vals
+    strvals    : list of strings; states to return (default all states present)
+    Output:
+    states : dict of (ssindices, sstimes) keyed by state, as from getstrstartstop;
+             a state not present has ssindices np.array(2,0) and sstimes None"""
+    numdata_vals = data_vals.shape[0]
+    numdata_times = data_times.shape[0]    
+    if (numdata_vals != numdata_times):
+        message = 'number of data values (%d) not equal to number of data times (%d)' % (numdata_vals,numdata_times)
+        return message
+    
+    (run_vals, run_codes, states, run_start, run_stop) = staterle(data_vals)
+    
+#   remove runs of one sample at the ends of the data
+    use = ~((run_start == run_stop) & ((run_start == 0) | (run_stop == numdata_vals - 1)))
+    run_codes = run_codes[use]
+    run_start = run_start[use]
+    run_stop = run_stop[use]
+    
+#   group runs by state, in time order within each state
+    order = np.argsort(run_codes, kind='mergesort')
+    bounds = np.searchsorted(run_codes[order], np.arange(states.shape[0] + 1))
+    
+    if strvals is None:
+        strvals = states.tolist()
+    out = {}
+    for strval in strvals:
+        k = np.searchsorted(states, strval)
+        if (k < states.shape[0]) and (states[k] == strval):
+            idx = order[bounds[k]:bounds[k + 1]]
+        else:
+            idx = np.zeros(0, dtype=int)
+        ssindices = np.vstack((run_start[idx], run_stop[idx]))
+        if (idx.shape[0] > 0):
+            sstimes = np.vstack((data_times[run_start[idx]], data_times[run_stop[idx]]))
+        else:
+            sstimes = None
+        out[strval] = (ssindices, sstimes)
+    return out
+
 def findstrstartstop(data_vals,data_times,strval):
     """Function to find the start and stop times for string mneumonic of specific value.
     Goal is to have equal number of start and stop times with first start time before
@@ -25,60 +91,13 @@ def findstrstartstop(data_vals,data_times,strval):
         one time interval, data_times[0] is start time, data_times[-1] is stop time 
     6. any(data_vals == strval) is False
         There are no start and stop times in time interval."""
-    numdata_vals = data_vals.shape[0]
-    numdata_times = data_times.shape[0]    
-    if (numdata_vals != numdata_times):
-        message = 'number of data values (%d) not equal to number of data times (%d)' % (numdata_vals,numdata_times)
-        return message
-    else:
-        numdata = numdata_vals
-        
-#   put in tests for string and float for input, somehow...
-    
-#   find start indices for strval
-    start_index = find(((data_vals[1:] == strval) & (data_vals[:-1] != strval))) + 1
-    num_start = start_index.shape[0]
-    
-#   find start indices for strval
-    stop_index = find((data_vals[:-1] == strval) & (data_vals[1:] != strval))
-    num_stop = stop_index.shape[0]
-    
-#   special case 1. (data_vals[0] == strval) and (data_vals[1] == strval)
-    if ((data_vals[0] == strval) & (data_vals[1] == strval)):
-        start_index = resize(start_index,(num_start+1,)) # lengthen array by 1
-        start_index[1:] = start_index[:-1] # move data by 1 towards end
-        start_index[0] = 0 # set initial index
-        num_start = start_index.shape[0]
-    
-#   special case 2. (data_vals[0] == strval) and (data_vals[1] != strval)
-    if (data_vals[0] == strval) & (data_vals[1] != strval):
-        stop_index[:-1] = stop_index[1:] # move data by 1 towards beginning
-        stop_index = resize(stop_index,(num_stop-1,)) # shorten array by 1, removing last stop index
-        num_stop = stop_index.shape[0]
-    
-#   special case 3. (data_vals[-1] == strval) and (data_vals[-2] == strval)
-    if ((data_vals[-1] == strval) & (data_vals[-2] == strval)):
-        stop_index = resize(stop_index,(num_stop+1,)) # lengthen array by 1
-        stop_index[-1] = data_vals.shape[0] - 1 # set final index
-        num_stop = stop_index.shape[0]
-    
-#   special case 4. (data_vals[-1] == strval) and (data_vals[-2] != strval)
-    if ((data_vals[-1] == strval) & (data_vals[-2] != strval)):
-        start_index = resize(start_index,(num_start-1,)) # shorten array by 1, removing last start index
-        num_start = start_index.shape[0]
-    
-#   obtain start and stop times
-    if ((num_start > 0) and (num_start == num_stop)):
-        sstimes = zeros((num_start,2))
-        sstimes[:,0] = data_times[start_index]
-        sstimes[:,1] = data_times[stop_index]
-    else:
-        sstimes = None
-
-    ssindices = vstack((start_index,stop_index))
-    ssindices = ssindices.transpose()
-
-    return (ssindices,sstimes)
+    states = getstatestartstop(data_vals, data_times, [strval])
+    if isinstance(states, str):
+        return states # error message
+    (ssindices, sstimes) = states[strval]
+    if sstimes is not None:
+        sstimes = sstimes.transpose()
+    return (ssindices.transpose(), sstimes)
 
 # getstrstartstop is an alternate version of findstrstartstop
 def getstrstartstop(data_vals,data_times,strval):
@@ -106,58 +125,140 @@ def getstrstartstop(data_vals,data_times,strval):
         one time interval, data_times[0] is start time, data_times[-1] is stop time 
     6. any(data_vals == strval) is False
         There are no start and stop times in time interval."""
-    numdata_vals = data_vals.shape[0]
-    numdata_times = data_times.shape[0]    
-    if (numdata_vals != numdata_times):
-        message = 'number of data values (%d) not equal to number of data times (%d)' % (numdata_vals,numdata_times)
-        return message
-    else:
-        numdata = numdata_vals
-        
-#   put in tests for string and float for input, somehow...
-    
-#   find start indices for strval
-    start_index = find(((data_vals[1:] == strval) & (data_vals[:-1] != strval))) + 1
-    num_start = start_index.shape[0]
-    
-#   find start indices for strval
-    stop_index = find((data_vals[:-1] == strval) & (data_vals[1:] != strval))
-    num_stop = stop_index.shape[0]
-    
-#   special case 1. (data_vals[0] == strval) and (data_vals[1] == strval)
-    if ((data_vals[0] == strval) & (data_vals[1] == strval)):
-        start_index = resize(start_index,(num_start+1,)) # lengthen array by 1
-        start_index[1:] = start_index[:-1] # move data by 1 towards end
-        start_index[0] = 0 # set initial index
-        num_start = start_index.shape[0]
-    
-#   special case 2. (data_vals[0] == strval) and (data_vals[1] != strval)
-    if (data_vals[0] == strval) & (data_vals[1] != strval):
-        stop_index[:-1] = stop_index[1:] # move data by 1 towards beginning
-        stop_index = resize(stop_index,(num_stop-1,)) # shorten array by 1, removing last stop index
-        num_stop = stop_index.shape[0]
-    
-#   special case 3. (data_vals[-1] == strval) and (data_vals[-2] == strval)
-    if ((data_vals[-1] == strval) & (data_vals[-2] == strval)):
-        stop_index = resize(stop_index,(num_stop+1,)) # lengthen array by 1
-        stop_index[-1] = data_vals.shape[0] - 1 # set final index
-        num_stop = stop_index.shape[0]
-    
-#   special case 4. (data_vals[-1] == strval) and (data_vals[-2] != strval)
-    if ((data_vals[-1] == strval) & (data_vals[-2] != strval)):
-        start_index = resize(start_index,(num_start-1,)) # shorten array by 1, removing last start index
-        num_start = start_index.shape[0]
-    
-#   obtain start and stop times
-    if ((num_start > 0) and (num_start == num_stop)):
-        sstimes = zeros((2,num_start))
-        sstimes[0,:] = data_times[start_index]
-        sstimes[1,:] = data_times[stop_index]
-    else:
-        sstimes = None
+    states = getstatestartstop(data_vals, data_times, [strval])
+    if isinstance(states, str):
+        return states # error message
+    return states[strval]
+
+class StateRuns(object):
+    """Runs of a state MSID accumulated from consecutive chunks of data, for the
+    start and stop times of states over long time spans with bounded memory;
+    a run continuing across chunks is joined, so the result is that of
+    getstatestartstop for all data at once.
+    Methods:
+    add(data_vals, data_times) : add the next chunk of data, in time order
+    startstop(strvals) : dict of np.array(2,num) of start (0) and stop (1) times
+                         keyed by state, np.array(2,0) for a state not present"""
+    def __init__(self):
+        self.vals = []
+        self.starts = []
+        self.stops = []
+        self.counts = []
+        self.tfirst = None # time of first sample
+        self.tlast = None # time of last sample
+
+    def add(self, data_vals, data_times):
+        (run_vals, run_codes, states, run_start, run_stop) = staterle(data_vals)
+        if (run_vals.shape[0] == 0):
+            return
+        starts = data_times[run_start]
+        stops = np.array(data_times[run_stop])
+        counts = run_stop - run_start + 1
+#       join first run with last run of previous chunk if the same state
+        if self.vals and (self.vals[-1][-1] == run_vals[0]):
+            self.stops[-1][-1] = stops[0]
+            self.counts[-1][-1] += counts[0]
+            (run_vals, starts, stops, counts) = (run_vals[1:], starts[1:], stops[1:], counts[1:])
+        if self.tfirst is None:
+            self.tfirst = data_times[0]
+        self.tlast = data_times[-1]
+        if (run_vals.shape[0] > 0):
+            self.vals.append(run_vals)
+            self.starts.append(starts)
+            self.stops.append(stops)
+            self.counts.append(counts)
+
+    def startstop(self, strvals):
+        out = dict((strval, np.zeros((2, 0))) for strval in strvals)
+        if not self.vals:
+            return out
+        vals = np.concatenate(self.vals)
+        starts = np.concatenate(self.starts)
+        stops = np.concatenate(self.stops)
+        counts = np.concatenate(self.counts)
+#       remove runs of one sample at the ends of the data
+        use = np.ones(vals.shape[0], dtype=bool)
+        use[[0, -1]] = (counts[[0, -1]] > 1)
+        for strval in strvals:
+            idx = np.flatnonzero(use & (vals == strval))
+            out[strval] = np.vstack((starts[idx], stops[idx]))
+        return out
+
+def rangemask(lo, hi, num):
+    """Function to mark the indices covered by a set of index ranges
+    Input:
+    lo  : int np.array(nrange,); first index of each range
+    hi  : int np.array(nrange,); index after the last of each range (empty if hi <= lo)
+    num : int; number of indices
+    Output:
+    mask : bool np.array(num,); True for indices in any range lo <= index < hi"""
+    use = (hi > lo)
+    count = np.zeros(num + 1, dtype=int)
+    np.add.at(count, lo[use], 1)
+    np.add.at(count, hi[use], -1)
+    return (count[:-1].cumsum() > 0)
+
+class IntervalSet(object):
+    """Set of closed time intervals start <= time <= stop, which may overlap,
+    with queries by sorted arrays & searchsorted, O((N+M) log M), in place of
+    comparing every interval to every point or interval.
+    Input:
+    times : np.array(2,num) of start (0) and stop (1) times"""
+    def __init__(self, times):
+        self.times = times
+        self.num = times.shape[1]
+#       starts sorted, with the maximum stop of intervals up to each start
+        order = np.argsort(times[0, :], kind='mergesort')
+        self.sorted_starts = times[0, order]
+        self.maxstops = np.maximum.accumulate(times[1, order]) if self.num > 0 else times[1, :]
+
+    def containsany(self, points):
+        """Function to find intervals with any of the points in the interval
+        Input:
+        points : np.array(npoint,) of times
+        Output:
+        bool np.array(num,); True for intervals with a point inside"""
+        (lo, hi) = self.pointranges(np.sort(points))
+        return (hi > lo)
+
+    def pointranges(self, points):
+        """Function to find the points within each interval
+        Input:
+        points : np.array(npoint,) of times in ascending order
+        Output:
+        (lo, hi) : int np.array(num,) each; points[lo:hi] are in each interval"""
+        lo = np.searchsorted(points, self.times[0, :], 'left')
+        hi = np.searchsorted(points, self.times[1, :], 'right')
+        return (lo, hi)
 
-    ssindices = vstack((start_index,stop_index))
-    ssindices = ssindices
+    def lastpoint(self, points):
+        """Function to find the last point within each interval
+        Input:
+        points : np.array(npoint,) of times in ascending order
+        Output:
+        int np.array(num,); index of last point in each interval, -1 for no points"""
+        (lo, hi) = self.pointranges(points)
+        return np.where(hi > lo, hi - 1, -1)
 
-    return (ssindices,sstimes)
+    def pointsin(self, points):
+        """Function to find points within any interval of the set
+        Input:
+        points : np.array(npoint,) of times
+        Output:
+        bool np.array(npoint,); True for points within an interval"""
+        k = np.searchsorted(self.sorted_starts, points, 'right')
+        inside = np.zeros(points.shape[0], dtype=bool)
+        inside[k > 0] = (self.maxstops[k[k > 0] - 1] >= points[k > 0])
+        return inside
 
+    def within(self, other):
+        """Function to find intervals contained in any interval of another set
+        Input:
+        other : IntervalSet
+        Output:
+        bool np.array(num,); True for intervals with other start <= start
+                             and stop <= other stop"""
+        k = np.searchsorted(other.sorted_starts, self.times[0, :], 'right')
+        inside = np.zeros(self.num, dtype=bool)
+        inside[k > 0] = (other.maxstops[k[k > 0] - 1] >= self.times[1, k > 0])
+        return inside
@@ -0,0 +1,459 @@
+#!/usr/bin/env python
+"""
+benchirudata.py
+
+Benchmarks of the getirudata hot paths on synthetic telemetry (no archive
+access): getstrstartstop, the maneuver selection steps, irucounts,
+irurates, IruModel.rates with output buffers, the maneuver propagation
+(manvrprop and manvrcalc), the output writer, and the startup time of
+importing each getirudata module in a new process.  The best time of each benchmark is appended to a JSON history file
+with the getirudata version and the synthetic data configuration, and
+compared with the last run of the same configuration, so regressions show
+up between versions (v33c, v33d, ...).  The startup benchmark fails (exit
+status 1) if a module imports matplotlib, scipy, Ska or Chandra modules at
+import time, which are to be imported on first use, or takes longer than
+--max-import-time to import.  The run also fails if the prefix-sum and
+robust bias statistics of irudefs.windowstats differ on the NPNT windows, or
+if the blocked scan propagation (quatdefs.qscan) of a maneuver differs from
+the sequential chain by more than --max-scan-error.
+
+  python benchirudata.py --version v33c --num-manvr 50
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+
+import numpy as np
+
+from arraydata import getstrstartstop, IntervalSet, rangemask
+from quatdefs import vect2quat, quatmult, qscanerror
+import irudefs as iru
+from manvrdefs import manvrcalc, manvrprop, manvrkeys, scan_block
+from iruout import iruarrays, writeiru
+
+# Calibration arrays as in getirudata33c.py
+Gmat = np.array([[-0.499539493,  0.500015266,  0.500455729, -0.500504173],
+                 [-0.254059137,  0.609733116, -0.253191860,  0.610258254],
+                 [-0.557983976, -0.053139506, -0.556465488, -0.053843139]])
+Umat = np.array([[-0.498768681599350, -0.076240169039052, -0.863375491725958],
+                 [ 0.500265748681156,  0.788096859372320, -0.358660734576184],
+                 [ 0.500711245008005, -0.075089767304433, -0.862351305901781],
+                 [-0.499738137314404,  0.788337746634606, -0.358866815375450]])
+SFpos = np.array([ 1.0, 0.1555267e-05, 0.1564191e-05,
+                        0.1552225e-05, 0.1569751e-05]) * 0.25625 / 4.0
+SFneg = np.array([-1.0, 0.1555571e-05, 0.1564383e-05,
+                        0.1552371e-05, 0.1570025e-05]) * 0.25625 / 4.0
+SFact = np.vstack((SFpos, SFneg))
+Dmat = np.zeros((3, 3))
+npnt_min_dur = 20.0 * 60.0 # minimum duration of NPNT before and after maneuver (sec)
+conv_time = 360.0 # Kalman filter converge time for small errors (sec)
+kalm_delay = 120.0 # time from end of maneuver to KALM (sec)
+
+gyro_dt = 0.25625 # AOGYRCT sample time (sec)
+quat_dt = 1.025 # AOATTQT and AOPCADMD sample time (sec)
+bias_dt = 32.8 # AOGBIAS sample time (sec)
+tzero = 441763266.184 # 2012:001:00:00:00.000 (sec)
+
+def synthtelem(num_manvr=50, manvr_dur=900.0, npnt_dur=3600.0, max_angle=120.0,
+               rollovers=True, seed=0):
+    """Function to generate synthetic AOPCADMD, AOACASEQ, AOATTQT, AOGYRCT and
+       AOGBIAS telemetry for a series of maneuvers between NPNT intervals.
+       Each maneuver is a constant rate rotation about a random axis by a random
+       angle up to max_angle; gyro counts are those of the body rotation plus
+       a constant bias and noise.
+       Input  num_manvr : number of maneuvers
+              manvr_dur : duration of each maneuver (sec)
+              npnt_dur  : duration of each NPNT interval (sec)
+              max_angle : maximum maneuver angle (deg)
+              rollovers : True to wrap gyro counts to 16 bits as telemetered,
+                          False for accumulated counts without roll-over
+              seed      : random number seed
+       Output data : dict of arrays keyed by MSID group, 'pcadmd' & 'acaseq'
+                     (times, vals) of state strings, and 'quat' array(5,num),
+                     'cnts' array(5,num), 'bias' array(4,num) with row 0 time
+    """
+    rng = np.random.RandomState(seed)
+    tend = tzero + npnt_dur + num_manvr * (manvr_dur + npnt_dur)
+    nman_start = tzero + npnt_dur + np.arange(num_manvr) * (manvr_dur + npnt_dur)
+    nman_stop = nman_start + manvr_dur
+    axes = rng.normal(size=(3, num_manvr))
+    axes = axes / np.sqrt((axes * axes).sum(axis=0))
+    angles = np.radians(rng.uniform(5.0, max_angle, num_manvr))
+    rates = axes * angles / manvr_dur # body rate of each maneuver (rad/sec)
+    bias = rng.normal(0.0, 1.0e-7, 3) # body rate bias (rad/sec)
+
+#   PCAD mode and Kalman sequence at quaternion times
+    tq = np.arange(tzero, tend, quat_dt)
+    k = np.searchsorted(nman_start, tq, 'right') - 1 # last maneuver started
+    in_nman = (k >= 0) & (tq < nman_stop[np.maximum(k, 0)])
+    pcadmd = np.where(in_nman, 'NMAN', 'NPNT')
+    in_guid = in_nman | ((k >= 0) & (tq < nman_stop[np.maximum(k, 0)] + kalm_delay))
+    acaseq = np.where(in_guid, 'GUID', 'KALM')
+
+#   attitude quaternions, fixed in NPNT and rotating at constant rate in NMAN
+    quat = np.zeros((5, tq.shape[0]))
+    quat[0, :] = tq
+    q = np.array([0.0, 0.1, 0.2, 0.3, 0.9])
+    q[1:] = q[1:] / np.sqrt((q[1:] * q[1:]).sum())
+    i0 = 0
+    for n in range(num_manvr):
+        (i1, i2) = np.searchsorted(tq, [nman_start[n], nman_stop[n]])
+        quat[1:, i0:i1] = q[1:, np.newaxis]
+        rotvec = np.zeros((4, i2 - i1))
+        rotvec[1:, :] = rates[:, n:n + 1] * (tq[i1:i2] - nman_start[n])
+        quat[1:, i1:i2] = quatmult(q, vect2quat(rotvec))[1:, :]
+        rotvec = np.zeros(4)
+        rotvec[1:] = rates[:, n] * manvr_dur
+        q = quatmult(q, vect2quat(rotvec))[:, 0]
+        i0 = i2
+    quat[1:, i0:] = q[1:, np.newaxis]
+
+#   gyro counts of body rotation plus bias and noise
+    tg = np.arange(tzero, tend, gyro_dt)
+    k = np.searchsorted(nman_start, tg, 'right') - 1
+    in_nman = (k >= 0) & (tg < nman_stop[np.maximum(k, 0)])
+    omega = np.where(in_nman, rates[:, np.maximum(k, 0)], 0.0) + bias[:, np.newaxis]
+    deltacnts = np.dot(Umat, omega) * gyro_dt / SFpos[1:, np.newaxis]
+    deltacnts = deltacnts + rng.normal(0.0, 0.5, deltacnts.shape)
+    accum = np.floor(deltacnts.cumsum(axis=1))
+    if rollovers:
+        accum = np.mod(accum, 2**16)
+    cnts = np.vstack((tg, accum))
+
+#   PCAD gyro bias
+    tb = np.arange(tzero, tend, bias_dt)
+    pcadbias = np.vstack((tb, np.tile(bias[:, np.newaxis], (1, tb.shape[0]))))
+
+    data = {'pcadmd': (tq, pcadmd), 'acaseq': (tq, acaseq), 'quat': quat,
+            'cnts': cnts, 'bias': pcadbias}
+    return data
+
+def findstates(data):
+    """Function to find NPNT, NMAN and KALM intervals, as getirudata33c.py"""
+    (tq, pcadmd) = data['pcadmd']
+    (tq, acaseq) = data['acaseq']
+    npnt = getstrstartstop(pcadmd, tq, 'NPNT')
+    nman = getstrstartstop(pcadmd, tq, 'NMAN')
+    kalm = getstrstartstop(acaseq, tq, 'KALM')
+    return (npnt, nman, kalm)
+
+def selectmanvrs(npnt, nman, kalm):
+    """Function to select maneuvers with NPNT before and after and the last
+       KALM start after each maneuver, as steps 2-6, 10 & 11 of getirudata33c.py
+       Output windows : array(2,num) of NPNT before start & NPNT after stop times
+              nman_times, kalm_times : array(2,num) of selected intervals
+    """
+    (npnt_indices, npnt_times) = npnt
+    (nman_indices, nman_times) = nman
+    (kalm_indices, kalm_times) = kalm
+    kalm_in_npnt = np.ones(npnt_times.shape[1], dtype=bool)
+    kalm_in_npnt[1:] = IntervalSet(npnt_times[:, 1:]).containsany(kalm_times[0, :])
+    npnt_indices = npnt_indices[:, kalm_in_npnt]
+    npnt_times = npnt_times[:, kalm_in_npnt]
+    npnt_with_min = ((npnt_times[1, :] - npnt_times[0, :]) >= npnt_min_dur)
+    npnt_indices = npnt_indices[:, npnt_with_min]
+    npnt_times = npnt_times[:, npnt_with_min]
+    nman_with_npnt = (np.in1d(nman_indices[0, :] - 1, npnt_indices[1, :]) &
+                      np.in1d(nman_indices[1, :] + 1, npnt_indices[0, :]))
+    nman_indices = nman_indices[:, nman_with_npnt]
+    nman_times = nman_times[:, nman_with_npnt]
+    npnt_before = npnt_times[:, np.in1d(npnt_indices[1, :], nman_indices[0, :] - 1)]
+    npnt_after = npnt_times[:, np.in1d(npnt_indices[0, :], nman_indices[1, :] + 1)]
+    windows = np.vstack((npnt_before[1, :] - npnt_min_dur, npnt_after[0, :] + npnt_min_dur))
+    npnt_after_set = IntervalSet(np.vstack((npnt_after[0, :], windows[1, :])))
+    kalm_times = kalm_times[:, npnt_after_set.pointsin(kalm_times[0, :])]
+    (kalm_lo, kalm_hi) = npnt_after_set.pointranges(kalm_times[0, :])
+    kalm_times = kalm_times[:, ~rangemask(kalm_lo, kalm_hi - 1, kalm_times.shape[1])]
+    return (windows, nman_times, kalm_times)
+
+def windowslices(data, windows):
+    """Function to slice quaternion, count and bias arrays for each window"""
+    slices = []
+    for n in range(windows.shape[1]):
+        win = {}
+        for name in ('quat', 'cnts', 'bias'):
+            (i0, i1) = np.searchsorted(data[name][0, :], windows[:, n])
+            win[name] = data[name][:, i0:i1]
+        slices.append(win)
+    return slices
+
+def manvrcalcs(slices, nman_times, kalm_times):
+    """Function to run manvrcalc for each maneuver, as the getirudata33c.py loop"""
+    model = iru.IruModel(Dmat, np.zeros((3, 3)), Gmat, SFact)
+    num = len(slices)
+    results = {}
+    for (name, rows) in manvrkeys:
+        shape = rows if isinstance(rows, tuple) else (rows,)
+        results[name] = np.zeros(shape + (num,))
+    for n in range(num):
+        res = manvrcalc(slices[n]['quat'], slices[n]['cnts'], slices[n]['bias'], None,
+                        nman_times[0, n], kalm_times[0, n], conv_time, model)
+        for (name, rows) in manvrkeys:
+            results[name][..., n] = res[name]
+    return results
+
+def manvrprops(rates):
+    """Function to run manvrprop for each maneuver's body rates"""
+    for angratebody in rates:
+        manvrprop(angratebody, 1, angratebody.shape[1] - 1)
+
+def writeout(results, outdir):
+    """Function to write the maneuver arrays with iruout, as getirudata33c.py"""
+    signcode = iru.irusigns(Umat, results['ini2finvect'][1:, :])
+    arrays = iruarrays(results['manvrtime'], results['initquat'], results['finalquat'],
+                       results['manvrquat'], results['intratebody'], results['diffchancnts'],
+                       results['ini2finang'], results['pcadbias_start'],
+                       results['ave_bias_before_nman'], results['ave_bias_after_nman'],
+                       signcode, results['sumprop'], results['sumproprot'])
+    writeiru(os.path.join(outdir, 'benchirudata'), arrays)
+
+def besttime(func, args, repeat):
+    """Function to return the best time of repeat calls of func(*args) (sec)"""
+    times = []
+    for r in range(repeat):
+        t0 = timeit.default_timer()
+        func(*args)
+        times.append(timeit.default_timer() - t0)
+    return min(times)
+
+def runbench(config, repeat=3):
+    """Function to run all benchmarks for a synthetic data configuration
+       Input  config : dict of synthtelem keyword arguments
+              repeat : number of times each benchmark is run
+       Output times : dict of best time (sec) keyed by benchmark name
+    """
+    data = synthtelem(**config)
+    times = {}
+    times['getstrstartstop'] = besttime(findstates, (data,), repeat)
+    (npnt, nman, kalm) = findstates(data)
+    times['selection'] = besttime(selectmanvrs, (npnt, nman, kalm), repeat)
+    (windows, nman_times, kalm_times) = selectmanvrs(npnt, nman, kalm)
+    times['irucounts'] = besttime(iru.irucounts, (data['cnts'],), repeat)
+    (accumcnts, deltacnts, ratecnts) = iru.irucounts(data['cnts'])
+    Bias3 = data['bias'][1:, 0]
+    times['irurates'] = besttime(iru.irurates, (Dmat, np.zeros((3, 3)), Gmat, SFact,
+                                                np.zeros(4), Bias3, ratecnts), repeat)
+    (angratechan, angratebody) = iru.irurates(Dmat, np.zeros((3, 3)), Gmat, SFact,
+                                              np.zeros(4), Bias3, ratecnts)
+    model = iru.IruModel(Dmat, np.zeros((3, 3)), Gmat, SFact)
+    times['irumodel'] = besttime(model.rates, (np.zeros(4), Bias3, ratecnts,
+                                               (np.empty(ratecnts.shape), np.empty((4, ratecnts.shape[1])))),
+                                 repeat)
+    rates = []
+    for n in range(nman_times.shape[1]):
+        (i0, i1) = np.searchsorted(angratebody[0, :], nman_times[:, n])
+        rates.append(angratebody[:, i0 - 1:i1 + 1])
+    times['manvrprop'] = besttime(manvrprops, (rates,), repeat)
+    slices = windowslices(data, windows)
+    times['manvrcalc'] = besttime(manvrcalcs, (slices, nman_times, kalm_times), repeat)
+    results = manvrcalcs(slices, nman_times, kalm_times)
+    outdir = tempfile.mkdtemp()
+    try:
+        times['writeiru'] = besttime(writeout, (results, outdir), repeat)
+    finally:
+        shutil.rmtree(outdir)
+    return times
+
+def checkwindowstats(data, windows, nman_times, tolerance=1.0e-9):
+    """Function to check that the prefix-sum and robust paths of
+       irudefs.windowstats agree on the NPNT windows before and after each
+       maneuver (no outliers in the synthetic counts) and give NaN for an
+       empty window
+       Input  tolerance : maximum relative difference of average & std dev
+       Output list of failure messages, empty if the check passed
+    """
+    (accumcnts, deltacnts, ratecnts) = iru.irucounts(data['cnts'])
+#   NPNT samples only: a maneuver starts up to quat_dt before its first NMAN sample
+    lo = np.searchsorted(ratecnts[0, :], np.hstack((windows[0, :], nman_times[1, :] + quat_dt)))
+    hi = np.searchsorted(ratecnts[0, :], np.hstack((nman_times[0, :] - quat_dt, windows[1, :])))
+    lo = np.hstack((lo, hi[:1])) # empty window
+    hi = np.hstack((hi, hi[:1]))
+    failures = []
+    with np.errstate(invalid='ignore'):
+        (ave, std) = iru.windowstats(ratecnts[1:, :], lo, hi)
+        (robust_ave, robust_std) = iru.windowstats(ratecnts[1:, :], lo, hi, robust=True)
+    if not (np.isnan(ave[:, -1]).all() and np.isnan(std[:, -1]).all() and
+            np.isnan(robust_ave[:, -1]).all() and np.isnan(robust_std[:, -1]).all()):
+        failures.append('windowstats: empty window not NaN')
+    maxdiff = max((np.abs(robust_ave[:, :-1] - ave[:, :-1]) / np.maximum(np.abs(ave[:, :-1]), 1.0)).max(),
+                  (np.abs(robust_std[:, :-1] - std[:, :-1]) / np.maximum(std[:, :-1], 1.0)).max())
+    if (maxdiff > tolerance):
+        failures.append('windowstats: robust and prefix-sum results differ by %.3g (relative)'
+                        % maxdiff)
+    return failures
+
+def checkqscan(data, nman_times, tolerance=1.0e-10):
+    """Function to check the precision of the blocked scan propagation
+       (quatdefs.qscan) against the sequential chain on the rotation of each
+       synthetic maneuver, with the block size of manvrprop
+       Input  tolerance : maximum rotation angle between the running products (rad)
+       Output list of failure messages, empty if the check passed
+    """
+    (accumcnts, deltacnts, ratecnts) = iru.irucounts(data['cnts'])
+    (angratechan, angratebody) = iru.irurates(Dmat, np.zeros((3, 3)), Gmat, SFact,
+                                              np.zeros(4), data['bias'][1:, 0], ratecnts)
+    maxerror = 0.0
+    for n in range(nman_times.shape[1]):
+        (i0, i1) = np.searchsorted(angratebody[0, :], nman_times[:, n])
+        rotvec = np.zeros((4, i1 - i0))
+        rotvec[1:, :] = angratebody[1:, i0:i1] * np.diff(angratebody[0, i0 - 1:i1])
+        maxerror = max(maxerror, qscanerror(vect2quat(rotvec)[1:, :], scan_block))
+    if (maxerror > tolerance):
+        return ['qscan: running products differ from the sequential chain by %.3g rad'
+                % maxerror]
+    return []
+
+def runchecks(config, max_scan_error=1.0e-10):
+    """Function to run the result checks for a synthetic data configuration
+       Input  config : dict of synthtelem keyword arguments
+              max_scan_error : tolerance of checkqscan (rad)
+       Output list of failure messages, empty if all checks passed
+    """
+    data = synthtelem(**config)
+    (npnt, nman, kalm) = findstates(data)
+    (windows, nman_times, kalm_times) = selectmanvrs(npnt, nman, kalm)
+    failures = checkwindowstats(data, windows, nman_times)
+    failures.extend(checkqscan(data, nman_times, max_scan_error))
+    return failures
+
+# modules of the startup benchmark, and the modules they may import on first
+# use only (top-level package names)
+startup_modules = ['quatdefs', 'quatfunc', 'irudefs', 'arraydata', 'mmathistory', 'manvrdefs',
+                   'manvrcols', 'manvrstore', 'pycal10', 'prefetch', 'ephemstore', 'fetchcache',
+                   'iruout', 'runprofile', 'plotbundle', 'intervalpool']
+lazy_modules = ['matplotlib', 'pylab', 'scipy', 'Ska', 'Chandra']
+
+def importtime(module, repeat):
+    """Function to import a module in a new Python process
+       Input  module : module name, in the directory of this script
+              repeat : number of imports, best time is kept
+       Output (time, lazy) : best import time (sec) and list of lazy_modules
+                             loaded by the import
+    """
+    code = ('import sys, time; t0 = time.time(); import %s; t = time.time() - t0; '
+            'print t; print " ".join(set(name.split(".")[0] for name in sys.modules))' % module)
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    times = []
+    for r in range(repeat):
+        out = subprocess.check_output([sys.executable, '-c', code], cwd=cwd).split('\n')
+        times.append(float(out[0]))
+    loaded = out[1].split()
+    return (min(times), [name for name in lazy_modules if name in loaded])
+
+def runstartup(repeat=3):
+    """Function to run the startup benchmark of startup_modules
+       Output (times, lazy) : dicts of best import time (sec) keyed by
+                              import_<module>, and of lazy_modules loaded
+                              keyed by module (modules loading none omitted)
+    """
+    times = {}
+    lazy = {}
+    for module in startup_modules:
+        (times['import_' + module], loaded) = importtime(module, repeat)
+        if loaded:
+            lazy[module] = loaded
+    return (times, lazy)
+
+def readhistory(historyfile):
+    if os.path.exists(historyfile):
+        with open(historyfile) as f:
+            return json.load(f)
+    return {'runs': []}
+
+def writehistory(historyfile, history):
+    tmpname = historyfile + '.tmp'
+    with open(tmpname, 'w') as f:
+        json.dump(history, f, indent=1, sort_keys=True)
+    os.rename(tmpname, historyfile)
+
+def get_opt():
+    parser = argparse.ArgumentParser(description='Benchmark getirudata with synthetic telemetry')
+    parser.add_argument('--version', type=str,
+                        default='v33c',
+                        help='getirudata version label of the run (default=v33c)')
+    parser.add_argument('--num-manvr', type=int,
+                        default=50,
+                        help='Number of maneuvers (default=50)')
+    parser.add_argument('--manvr-dur', type=float,
+                        default=900.0,
+                        help='Maneuver duration (sec, default=900)')
+    parser.add_argument('--npnt-dur', type=float,
+                        default=3600.0,
+                        help='NPNT duration between maneuvers (sec, default=3600)')
+    parser.add_argument('--max-angle', type=float,
+                        default=120.0,
+                        help='Maximum maneuver angle (deg, default=120)')
+    parser.add_argument('--rollovers', type=str,
+                        default='True',
+                        help='Wrap gyro counts to 16 bits (default=True)')
+    parser.add_argument('--repeat', type=int,
+                        default=3,
+                        help='Number of runs of each benchmark, best is kept (default=3)')
+    parser.add_argument('--tolerance', type=float,
+                        default=0.2,
+                        help='Fractional slow-down reported as a regression (default=0.2)')
+    parser.add_argument('--max-import-time', type=float,
+                        default=1.0,
+                        help='Maximum import time of a module in the startup benchmark '
+                             '(sec, default=1.0)')
+    parser.add_argument('--max-scan-error', type=float,
+                        default=1.0e-10,
+                        help='Maximum rotation angle between the blocked scan and the '
+                             'sequential propagation of a maneuver (rad, default=1e-10)')
+    parser.add_argument('--history', type=str,
+                        default='benchirudata.json',
+                        help='JSON history file (default=benchirudata.json)')
+    opt = parser.parse_args()
+    return opt
+
+if __name__ == '__main__':
+    opt = get_opt()
+    config = {'num_manvr': opt.num_manvr, 'manvr_dur': opt.manvr_dur,
+              'npnt_dur': opt.npnt_dur, 'max_angle': opt.max_angle,
+              'rollovers': opt.rollovers.lower() in ('y', 't', 'true')}
+    times = runbench(config, opt.repeat)
+    failures = runchecks(config, opt.max_scan_error)
+    (startup, lazy) = runstartup(opt.repeat)
+    times.update(startup)
+
+    history = readhistory(opt.history)
+    previous = [run for run in history['runs'] if run['config'] == config]
+    run = {'version': opt.version, 'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+           'host': platform.node(), 'python': platform.python_version(),
+           'numpy': np.__version__, 'config': config, 'times': times}
+    history['runs'].append(run)
+    writehistory(opt.history, history)
+
+    if previous:
+        print 'Compared with %s run of %s' % (previous[-1]['version'], previous[-1]['date'])
+    for name in ['getstrstartstop', 'selection', 'irucounts', 'irurates', 'irumodel',
+                 'manvrprop', 'manvrcalc', 'writeiru'] + ['import_' + module for module in startup_modules]:
+        line = '%-24s %10.4f sec' % (name, times[name])
+        if previous and (name in previous[-1]['times']):
+            ratio = times[name] / previous[-1]['times'][name]
+            line += '  %6.2fx' % ratio
+            if ratio > (1.0 + opt.tolerance):
+                line += '  REGRESSION'
+        print line
+
+#   result checks and startup benchmark limits
+    failed = False
+    for failure in failures:
+        print 'CHECK FAILED: %s' % failure
+        failed = True
+    for module in startup_modules:
+        if module in lazy:
+            print 'STARTUP FAILED: import %s loads %s' % (module, ', '.join(lazy[module]))
+            failed = True
+        if (startup['import_' + module] > opt.max_import_time):
+            print 'STARTUP FAILED: import %s takes %.3f sec' % (module, startup['import_' + module])
+            failed = True
+    if failed:
+        sys.exit(1)
@@ -0,0 +1,41 @@
+# ephemstore.py
+# CXO velocity with respect to the Sun for a whole processing interval,
+# fetched once and kept as CXO minus Sun velocity, for the aberration
+# adjustment of each maneuver window.
+
+import numpy as np
+from prefetch import fetchgroup, getwindow
+from quatdefs import lagrange4
+
+cxo_msids = ['orbitephem1_vx', 'orbitephem1_vy', 'orbitephem1_vz']
+sun_msids = ['solarephem1_vx', 'solarephem1_vy', 'solarephem1_vz']
+
+class EphemStore(object):
+    """CXO velocity with respect to the Sun (km/sec) for a time interval.
+       Input  tstart  : float; interval start time (sec)
+              tstop   : float; interval stop time (sec)
+              pad     : float; extend the interval by pad before and after (sec)
+              fetcher : object with an MSIDset function, fetch or a FetchCache
+       The velocity, array(4,num) with row 0 time, is in attribute vel.
+    """
+    def __init__(self, tstart, tstop, pad=0.0, fetcher=None):
+        cxovel = fetchgroup(cxo_msids, tstart - pad, tstop + pad, fetcher=fetcher)
+        sunvel = fetchgroup(sun_msids, tstart - pad, tstop + pad, fetcher=fetcher)
+        self.vel = cxovel.copy()
+        if (sunvel.shape != cxovel.shape) or (sunvel[0, :] != cxovel[0, :]).any():
+#           solar ephemeris at other times, interpolate to CXO ephemeris times
+            sunvel = np.vstack([cxovel[0, :]] + [np.interp(cxovel[0, :], sunvel[0, :], sunvel[k, :])
+                                                 for k in range(1, 4)])
+        self.vel[1:, :] = cxovel[1:, :] / 1000.0 - sunvel[1:, :] / 1000.0
+
+    def window(self, tstart, tstop, pad=0.0):
+        """Function to return the velocity samples for a time window
+           Output view of vel for tstart - pad <= time < tstop + pad
+        """
+        return getwindow(self.vel, tstart - pad, tstop + pad)
+
+    def velocity(self, times):
+        """Function to return the velocity interpolated to an array of times
+           Output array(4,len(times)) as from quatdefs.lagrange4
+        """
+        return lagrange4(self.vel, times)
@@ -0,0 +1,277 @@
+# fetchcache.py
+# On-disk cache of archive fetches.  Each group of MSIDs requested together
+# is stored as segments of contiguous time coverage, with a pair of .npy files
+# (times & vals) for each MSID that are memory mapped on read.  Requests are
+# served from the cached segments and only the uncovered parts of the time
+# range are fetched from the archive, for all MSIDs of the group so that bad
+# samples are filtered as without the cache; new data is merged with
+# overlapping or adjacent segments.  Segments are evicted least recently used
+# first when the cache exceeds its size limit.
+# A cache shared by several processes is given a lock, and the index is read
+# again and updated under the lock; archive fetches are made without it.
+
+import os
+import json
+import time
+import numpy as np
+
+cache_format = 2 # index format, segments of MSID groups
+
+class CachedMSID(object):
+    """Fetched data for one MSID, with the times & vals attributes of fetch.MSID
+    """
+    def __init__(self, msid, times, vals):
+        self.msid = msid
+        self.times = times
+        self.vals = vals
+
+def rangegaps(ranges, tstart, tstop):
+    """Function to find the parts of a time range not covered by a set of ranges
+       Input  ranges : list of (start, stop) disjoint ranges sorted by start
+              tstart : float; range start time (sec)
+              tstop  : float; range stop time (sec)
+       Output gaps : list of (start, stop) uncovered ranges within tstart to tstop
+    """
+    gaps = []
+    t = tstart
+    for (start, stop) in ranges:
+        if (stop <= t):
+            continue
+        if (start >= tstop):
+            break
+        if (start > t):
+            gaps.append((t, start))
+        t = max(t, stop)
+    if (t < tstop):
+        gaps.append((t, tstop))
+    return gaps
+
+class FetchCache(object):
+    """Cache of fetch.MSIDset results in directory cachedir.
+       Input  cachedir  : directory of the cache (created if needed), ~ expanded
+              max_bytes : maximum size of cached data (bytes)
+              recent    : data later than recent seconds before now is not
+                          cached since the archive may still be updating (sec)
+              archive   : object with an MSIDset function for uncached data
+                          (default None for fetch, imported on first use)
+              lock      : multiprocessing lock of the index, for a cache
+                          shared by processes (default None, not shared)
+       MSIDset(msids, tstart, tstop, filter_bad) is used in place of
+       fetch.MSIDset and returns a dict of CachedMSID keyed by msid.
+       The time range convention of the archive, tstart <= time < tstop,
+       is assumed when joining segments.
+    """
+    def __init__(self, cachedir, max_bytes=5e9, recent=3 * 86400.0, archive=None, lock=None):
+        self.cachedir = os.path.expanduser(cachedir)
+        self.max_bytes = max_bytes
+        self.recent = recent
+        if archive is None:
+            import Ska.engarchive.fetch as archive
+        self.archive = archive
+        self.lock = lock
+        self.indexfile = os.path.join(self.cachedir, 'index.json')
+        if not os.path.isdir(self.cachedir):
+            try:
+                os.makedirs(self.cachedir)
+            except OSError: # made by another process
+                if not os.path.isdir(self.cachedir):
+                    raise
+        self._read_index()
+
+    def _read_index(self):
+        if os.path.exists(self.indexfile):
+            with open(self.indexfile) as f:
+                self.index = json.load(f)
+        else:
+            self.index = {'format': cache_format, 'next_id': 0, 'segments': {}}
+        if (self.index.get('format') != cache_format):
+#           segments of single MSIDs of an earlier version, not consistent with
+#           the group fetches, are discarded
+            for name in os.listdir(self.cachedir):
+                if name.startswith('seg') and name.endswith('.npy'):
+                    os.remove(self._path(name))
+            self.index = {'format': cache_format, 'next_id': 0, 'segments': {}}
+
+    def _acquire(self):
+#       with a shared cache, hold the lock and take the index of other processes
+        if self.lock is not None:
+            self.lock.acquire()
+            self._read_index()
+
+    def _release(self):
+        if self.lock is not None:
+            self.lock.release()
+
+    def _key(self, msids, filter_bad):
+        return '%s_%s' % ('+'.join(sorted(msid.upper() for msid in msids)),
+                          'filt' if filter_bad else 'all')
+
+    def _path(self, name):
+        return os.path.join(self.cachedir, name)
+
+    def _save(self, name, arr):
+#       write to a temporary file and rename so a segment is never partial
+        tmpname = self._path(name + '.tmp')
+        with open(tmpname, 'wb') as f:
+            np.save(f, arr)
+        os.rename(tmpname, self._path(name))
+
+    def _remove(self, seg):
+        for msid in seg['msids']:
+            for ext in ('.times.npy', '.vals.npy'):
+                filename = self._path('%s_%s%s' % (seg['name'], msid, ext))
+                if os.path.exists(filename):
+                    os.remove(filename)
+
+    def _write_index(self):
+        tmpname = self.indexfile + '.tmp'
+        with open(tmpname, 'w') as f:
+            json.dump(self.index, f)
+        os.rename(tmpname, self.indexfile)
+
+    def _load(self, seg, msid):
+        name = '%s_%s' % (seg['name'], msid.upper())
+        times = np.load(self._path(name + '.times.npy'), mmap_mode='r')
+        vals = np.load(self._path(name + '.vals.npy'), mmap_mode='r')
+        return (times, vals)
+
+    def _store(self, key, msids, pieces):
+        """Function to merge fetched pieces (start, stop, msiddata) of a group,
+           msiddata a dict of (times, vals) keyed by msid, into the segments of
+           the group key, joining overlapping and adjacent segments
+        """
+        segs = self.index['segments'].setdefault(key, [])
+        for (start, stop, msiddata) in pieces:
+            joined = [seg for seg in segs if (seg['start'] <= stop) and (seg['stop'] >= start)]
+            parts = [(start, stop, msiddata)]
+            for seg in joined:
+                parts.append((seg['start'], seg['stop'],
+                              dict((msid, self._load(seg, msid)) for msid in msids)))
+            parts.sort(key=lambda part: part[0])
+            name = 'seg%06d' % self.index['next_id']
+            self.index['next_id'] += 1
+            nbytes = 0
+            for msid in msids:
+#               keep samples of each part after the end of the previous part
+                times_list = []
+                vals_list = []
+                tend = parts[0][0]
+                for (pstart, pstop, pdata) in parts:
+                    (ptimes, pvals) = pdata[msid]
+                    i0 = np.searchsorted(ptimes, tend)
+                    times_list.append(np.asarray(ptimes[i0:]))
+                    vals_list.append(np.asarray(pvals[i0:]))
+                    tend = max(tend, pstop)
+                newtimes = np.concatenate(times_list)
+                newvals = np.concatenate(vals_list)
+                self._save('%s_%s.times.npy' % (name, msid.upper()), newtimes)
+                self._save('%s_%s.vals.npy' % (name, msid.upper()), newvals)
+                nbytes += newtimes.nbytes + newvals.nbytes
+            for seg in joined:
+                self._remove(seg)
+                segs.remove(seg)
+            segs.append({'start': parts[0][0], 'stop': tend, 'name': name,
+                         'msids': [msid.upper() for msid in msids],
+                         'nbytes': int(nbytes), 'used': time.time()})
+            segs.sort(key=lambda seg: seg['start'])
+
+    def _evict(self, keep):
+        """Function to remove least recently used segments, except the names in
+           keep, until the cache is within max_bytes; a segment holds all MSIDs
+           of a group, which are evicted together
+        """
+        allsegs = [(seg['used'], key, seg) for (key, segs) in self.index['segments'].items()
+                   for seg in segs]
+        total = sum([seg['nbytes'] for (used, key, seg) in allsegs])
+        allsegs.sort(key=lambda s: s[0])
+        for (used, key, seg) in allsegs:
+            if (total <= self.max_bytes):
+                break
+            if seg['name'] in keep:
+                continue
+            self._remove(seg)
+            self.index['segments'][key].remove(seg)
+            total -= seg['nbytes']
+
+    def _gaps(self, key, tstart, tstop):
+        """Function to find the uncovered ranges of group key in tstart to tstop
+           Output gaps : list of (start, stop) ranges
+        """
+        segs = self.index['segments'].get(key, [])
+        return rangegaps([(seg['start'], seg['stop']) for seg in segs], tstart, tstop)
+
+    def _fetch(self, msids, gaps, filter_bad):
+        """Function to fetch the uncovered ranges of a group from the archive,
+           all msids of the group in each call so that bad samples are filtered
+           as in an uncached fetch
+           Output pieces : list of (start, stop, msiddata), msiddata a dict of
+                           (times, vals) keyed by msid
+        """
+        pieces = []
+        for gap in gaps:
+            gapdata = self.archive.MSIDset(msids, gap[0], gap[1], filter_bad=filter_bad)
+            pieces.append((gap[0], gap[1],
+                           dict((msid, (np.asarray(gapdata[msid].times),
+                                        np.asarray(gapdata[msid].vals))) for msid in msids)))
+        return pieces
+
+    def MSIDset(self, msids, tstart, tstop, filter_bad=False):
+        """Function to fetch MSIDs for a time range, from the cache if covered
+           Input  msids  : list of MSID names
+                  tstart : start time (DateTime compatible)
+                  tstop  : stop time (DateTime compatible)
+           Output data : dict of CachedMSID keyed by msid
+        """
+        from Chandra.Time import DateTime
+        tstart = DateTime(tstart).secs
+        tstop = DateTime(tstop).secs
+        tcache = min(tstop, DateTime().secs - self.recent) # end of cacheable time
+        key = self._key(msids, filter_bad)
+        data = {}
+
+#       find uncovered ranges of the group and fetch them with one call per range
+        if (tcache > tstart):
+            self._acquire()
+            try:
+                gaps = self._gaps(key, tstart, tcache)
+                while gaps:
+                    self._release()
+                    try:
+                        pieces = self._fetch(msids, gaps, filter_bad)
+                    finally:
+                        self._acquire()
+                    self._store(key, msids, pieces)
+#                   gaps remain only if another process evicted a segment meanwhile
+                    gaps = self._gaps(key, tstart, tcache)
+
+#               serve the range from the segment covering it
+                used = []
+                for seg in self.index['segments'][key]:
+                    if (seg['start'] <= tstart) and (tcache <= seg['stop']):
+                        for msid in msids:
+                            (times, vals) = self._load(seg, msid)
+                            (i0, i1) = np.searchsorted(times, [tstart, tcache])
+                            data[msid] = CachedMSID(msid, np.array(times[i0:i1]),
+                                                    np.array(vals[i0:i1]))
+                        seg['used'] = time.time()
+                        used.append(seg['name'])
+                        break
+                self._evict(used)
+                self._write_index()
+            finally:
+                self._release()
+
+#       fetch recent data directly
+        if (tcache < tstop):
+            recentdata = self.archive.MSIDset(msids, max(tstart, tcache), tstop,
+                                              filter_bad=filter_bad)
+            for msid in msids:
+                if msid in data:
+                    data[msid].times = np.concatenate((data[msid].times,
+                                                       recentdata[msid].times))
+                    data[msid].vals = np.concatenate((data[msid].vals,
+                                                      recentdata[msid].vals))
+                else:
+                    data[msid] = CachedMSID(msid, np.asarray(recentdata[msid].times),
+                                            np.asarray(recentdata[msid].vals))
+        return data
@@ -0,0 +1,182 @@
+# intervalpool.py
+# Run getirudata for several intervals of the interval table as independent
+# jobs in a process pool, e.g. to regenerate all calibration intervals after
+# a change of Gmat, scale factors or selection limits.  Archive fetches of
+# all jobs are limited by a shared semaphore, a shared telemetry cache is
+# updated under a lock, and a job failed by an archive or I/O error is
+# retried (other errors fail the job at once).  The printed output of
+# each job goes to its log file, and a roll-up summary of all jobs is written
+# when they are done.
+
+import os
+import sys
+import time
+import traceback
+import multiprocessing
+import numpy as np
+from fetchcache import FetchCache
+
+retry_wait = 60.0 # wait before retry of a failed job, times the attempt number (sec)
+
+def retryerrors():
+    """Function to list the exceptions of a job that are retried: I/O errors
+       of the archive & cache files, HDF5 errors of the archive files (if
+       PyTables is installed) and a locked archive file database
+       Output tuple of exception classes
+    """
+    import sqlite3
+    errors = [IOError, OSError, sqlite3.OperationalError]
+    try:
+        import tables
+        errors.append(tables.HDF5ExtError)
+    except ImportError:
+        pass
+    return tuple(errors)
+
+class ArchiveLimit(object):
+    """Fetcher allowing at most a number of archive fetches at once, with a
+       semaphore shared by the job processes
+       Input  fetcher   : object with an MSIDset function, fetch or a FetchCache
+              semaphore : multiprocessing semaphore
+    """
+    def __init__(self, fetcher, semaphore):
+        self.fetcher = fetcher
+        self.semaphore = semaphore
+
+    def MSIDset(self, msids, tstart, tstop, filter_bad=False):
+        self.semaphore.acquire()
+        try:
+            return self.fetcher.MSIDset(msids, tstart, tstop, filter_bad=filter_bad)
+        finally:
+            self.semaphore.release()
+
+# state of a job process, set by initjob
+worker = {}
+
+def initjob(func, semaphore, lock, fetch_cache, fetch_cache_size):
+    """Function to set up a job process, with the archive fetcher limited by
+       semaphore and, if fetch_cache is not empty, the shared cache
+    """
+    import Ska.engarchive.fetch as fetch
+    archive = ArchiveLimit(fetch, semaphore)
+    if fetch_cache:
+        worker['fetcher'] = FetchCache(fetch_cache, fetch_cache_size * 1e9,
+                                       archive=archive, lock=lock)
+    else:
+        worker['fetcher'] = archive
+    worker['func'] = func
+    worker['retry_errors'] = retryerrors()
+
+def jobsummary(res):
+    """Function to summarize the result of getirudata for an interval
+       Output dict of num_nman0, num_man, first & last maneuver times and
+              Dmat of the F/B 9-parameter filter (None if not run or not
+              computed relative to the on-board M-matrix)
+    """
+    from Chandra.Time import DateTime
+    manvrtime = res['manvrtime']
+    summary = dict(num_nman0=res['num_nman0'], num_man=manvrtime.shape[1],
+                   first=None, last=None, Dmat=None)
+    if (summary['num_man'] > 0):
+        summary['first'] = DateTime(manvrtime[0, 0]).date
+        summary['last'] = DateTime(manvrtime[1, -1]).date
+    if res['cal'] is not None:
+        summary['Dmat'] = res['cal'].get('Dmat')
+    return summary
+
+def runjob(job):
+    """Function to run getirudata for one interval in a job process, with its
+       printed output in the log file, retrying after an archive or I/O
+       error (see retryerrors); any other error fails the job at once
+       Input  job : tuple (num, intervaldef, opt, logfile, retries)
+       Output dict of num, label, status ('ok' or 'failed'), attempts, elapsed
+              time (sec), error (last line of the last exception) and the
+              jobsummary items if ok
+    """
+    (num, intervaldef, opt, logfile, retries) = job
+    result = dict(num=num, label=intervaldef[0], status='failed', error='')
+    t0 = time.time()
+    stdout = sys.stdout
+    log = open(logfile, 'w')
+    sys.stdout = log
+    try:
+        for attempt in range(1, retries + 2):
+            result['attempts'] = attempt
+            print 'Interval %d (%s), attempt %d' % (num, intervaldef[0], attempt)
+            try:
+                res = worker['func'](opt, intervaldef, worker['fetcher'])
+                result.update(jobsummary(res))
+                result['status'] = 'ok'
+                break
+            except Exception as error:
+                traceback.print_exc(file=log)
+                result['error'] = traceback.format_exc().strip().split('\n')[-1]
+                if not isinstance(error, worker['retry_errors']):
+                    print 'Not retried: not an archive or I/O error'
+                    break
+                if (attempt <= retries):
+                    log.flush()
+                    time.sleep(retry_wait * attempt)
+    finally:
+        sys.stdout = stdout
+        log.close()
+    result['elapsed'] = time.time() - t0
+    return result
+
+def runjobs(func, jobs, num_jobs, max_fetch, fetch_cache='', fetch_cache_size=5.0):
+    """Function to run interval jobs in a pool of num_jobs processes
+       Input  func : getirudata function, called as func(opt, intervaldef, fetcher)
+              jobs : list of tuples (num, intervaldef, opt, logfile, retries);
+                     longest intervals are started first
+              num_jobs  : number of job processes
+              max_fetch : maximum number of archive fetches at once
+              fetch_cache, fetch_cache_size : telemetry cache directory (empty
+                     for no cache) and maximum size (GB)
+       Output results : list of runjob results in order of jobs
+    """
+    from Chandra.Time import DateTime
+    order = sorted(range(len(jobs)), reverse=True,
+                   key=lambda k: DateTime(jobs[k][1][2]).secs - DateTime(jobs[k][1][1]).secs)
+    semaphore = multiprocessing.Semaphore(max_fetch)
+    lock = multiprocessing.Lock()
+    pool = multiprocessing.Pool(min(num_jobs, len(jobs)), initjob,
+                                (func, semaphore, lock, fetch_cache, fetch_cache_size))
+    results = {}
+    for result in pool.imap_unordered(runjob, [jobs[k] for k in order]):
+        print 'Interval %3d %-6s %-6s attempts = %d, elapsed = %.0f sec %s' % (
+            result['num'], result['label'], result['status'], result['attempts'],
+            result['elapsed'], result['error'])
+        results[result['num']] = result
+    pool.close()
+    pool.join()
+    return [results[job[0]] for job in jobs]
+
+def writerollup(filename, results, version):
+    """Function to write the roll-up summary of interval jobs, to a temporary
+       file renamed when complete
+       Input  filename : roll-up summary file name
+              results  : list of runjob results
+              version  : getirudata version
+    """
+    num_ok = len([result for result in results if result['status'] == 'ok'])
+    fsum = open(filename + '.tmp', 'w')
+    fsum.write('getirudata.py version %s\n' % (version))
+    fsum.write('Number of intervals = %d, ok = %d, failed = %d\n'
+               % (len(results), num_ok, len(results) - num_ok))
+    fsum.write(' num  label  status  attempts  elapsed  input  output'
+               '              first_maneuver               last_maneuver')
+    fsum.write(''.join(['       Dmat[%d,%d]' % (i, j) for i in (1, 2, 3) for j in (1, 2, 3)]))
+    fsum.write('\n')
+    for result in results:
+        fsum.write('%4d %6s %7s %9d %8.0f ' % (result['num'], result['label'], result['status'],
+                                               result['attempts'], result['elapsed']))
+        if (result['status'] == 'ok'):
+            fsum.write('%6d %7d %27s %27s' % (result['num_nman0'], result['num_man'],
+                                              result['first'], result['last']))
+            if result['Dmat'] is not None:
+                fsum.write(''.join([' %14.6e' % x for x in np.ravel(result['Dmat'])]))
+        else:
+            fsum.write(' %s' % (result['error']))
+        fsum.write('\n')
+    fsum.close()
+    os.rename(filename + '.tmp', filename)
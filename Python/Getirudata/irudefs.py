@@ -1,8 +1,7 @@
 # irudefs.py
 
-import numpy as np 
-from pylab import *
-from math import *
+import numpy as np
+from arraydata import rangemask
 
 def irusigns(Umat, vectors):
     """function to sign codes for an array of vector rotations
@@ -24,41 +23,67 @@ def irusigns(Umat, vectors):
 # -++- 6    +--+  9
 # -+++ 7    +---  8
 
+class IruModel(object):
+    """IRU rate model for one set of calibration arrays, i.e. one on-board
+       M-matrix epoch; the product (I+D)(I+M)G and the scale factors per sign
+       are computed once for all rates computed with the model
+       Input  Dmat : 3x3 array of coefficients to adjust on-board Mmat
+              Mmat : 3x3 array of on-board misalignment/scale-adjust matrix
+              Gmat : 3x4 array to combine IRU channels to obtain 3-vector
+              SFac : 2x5 array of time & scale factors (radians/count), row 0 for
+                     positive, row 1 for negative counts of each channel
+    """
+    def __init__(self, Dmat, Mmat, Gmat, SFac):
+        I3 = np.eye(3)
+        self.ProdMat = np.dot(np.dot(I3 + Dmat, I3 + Mmat), Gmat)
+        # scale factors (2,4) of channels 1-4, as columns for broadcasting over time
+        self.SFac = np.array(SFac, dtype=float)[:, 1:]
+        self.SFpos = self.SFac[0, :].reshape(4, 1)
+        self.SFneg = self.SFac[1, :].reshape(4, 1)
+
+    def rates(self, Bias4, Bias3, ratecnts, out=None):
+        """function to compute iru 3-vector rate, as irurates
+           input  Bias4 : 4-vector bias (counts/sec)
+                  Bias3 : 3-vector bias (radians/sec)
+                  ratecnts : 5xnum array of time & count rate (counts/sec) for each channel at each time
+                  out : tuple (chanrate, angrate) of 5xnum and 4xnum float arrays for
+                        the output, None to allocate them (out may not be ratecnts)
+           output
+                  chanrate : 5xnum array of time & rate (rad/sec) of each channel
+                  angrate  : 4xnum array of time & 3-vector rate (rad/sec)
+        """
+        num = ratecnts.shape[1]
+        if out is None:
+            out = (np.empty((5, num)), np.empty((4, num)))
+        (chanrate, angrate) = out
+        
+        chanrate[0, :] = ratecnts[0, :]
+        np.subtract(ratecnts[1:, :], np.reshape(Bias4, (4, 1)), out=chanrate[1:, :])
+        # scale factor of the sign of each count rate, zero rates stay zero
+        chanrate[1:, :] *= np.where(chanrate[1:, :] > 0.0, self.SFpos, self.SFneg)
+        
+        angrate[0, :] = chanrate[0, :]
+        angrate[1:, :] = np.dot(self.ProdMat, chanrate[1:, :])
+        angrate[1:, :] -= np.reshape(Bias3, (3, 1))
+        
+        return (chanrate, angrate)
+
+
 def irurates(Dmat, Mmat, Gmat, SFac, Bias4, Bias3, ratecnts):
     """function to compute iru 3-vector rate
        input  Dmat : 3x3 array of coefficients to adjust on-board Mmat
               Mmat : 3x3 array of on-board misalignment/scale-adjust matrix
               Gmat : 3x4 array to combine IRU channels to obtain 3-vector
-              SFac : 2x4 array of scale factors (radians/count) for each sign of eah channel
+              SFac : 2x5 array of time & scale factors (radians/count) for each sign of eah channel
               Bias4 : 4-vector bias (counts/sec)
               Bias3 : 3-vector bias (radians/sec)
               ratecnts : 5xnum array of time & count rate (counts/sec) for each channel at each time
        output
-              chanrate :
-              angrate  :
+              chanrate : 5xnum array of time & rate (rad/sec) of each channel
+              angrate  : 4xnum array of time & 3-vector rate (rad/sec)
+       For repeated calls with the same calibration arrays use IruModel.rates
     """
-    chanrate = ratecnts.copy()
-    Bias4 = Bias4.copy()
-    Bias3 = Bias3.copy()
-    if Bias4.ndim == 1:
-        Bias4 = reshape(Bias4,(4,1))
-    if Bias3.ndim == 1:
-        Bias3 = reshape(Bias3,(3,1))
-    
-    I3 = np.eye(3)
-    ProdMat = dot(dot(I3 + Dmat, I3 + Mmat), Gmat)
-    
-    chanrate[1:, :] = chanrate[1:,:] - Bias4
-    chanrate[1, :] = chanrate[1, :] * ((chanrate[1, :] > 0.0) * SFac[0, 1] + (chanrate[1, :] < 0.0) * SFac[1, 1])
-    chanrate[2, :] = chanrate[2, :] * ((chanrate[2, :] > 0.0) * SFac[0, 2] + (chanrate[2, :] < 0.0) * SFac[1, 2])
-    chanrate[3, :] = chanrate[3, :] * ((chanrate[3, :] > 0.0) * SFac[0, 3] + (chanrate[3, :] < 0.0) * SFac[1, 3])
-    chanrate[4, :] = chanrate[4, :] * ((chanrate[4, :] > 0.0) * SFac[0, 4] + (chanrate[4, :] < 0.0) * SFac[1, 4])
-    
-    angrate = zeros((4,chanrate.shape[1]))
-    angrate[0, :] = chanrate[0, :]
-    angrate[1:,:] = dot(ProdMat, chanrate[1:,:]) - Bias3
-    
-    return (chanrate, angrate)
+    return IruModel(Dmat, Mmat, Gmat, SFac).rates(Bias4, Bias3, ratecnts)
 
 
 def irucounts(accumcnts):
@@ -80,13 +105,98 @@ def irucounts(accumcnts):
     accumcnts = accumcnts.copy()
     deltacnts = np.zeros(accumcnts.shape)
     deltacnts[0, 1:] = accumcnts[0, 1:] - accumcnts[0, 0:-1]
-    deltacnts[1:, 1:] = int16(accumcnts[1:, 1:] - accumcnts[1:, :-1])
+    deltacnts[1:, 1:] = np.int16(accumcnts[1:, 1:] - accumcnts[1:, :-1])
     # accumulated angle counts per channel, adjusted for rollover, with first value zero
     accumcnts[1:, :] = deltacnts[1:, :].cumsum(axis=1)
     # count rate per channel for each time step, number of time values one less than accumcnts
-    ratecnts = zeros((accumcnts.shape[0], accumcnts.shape[1] - 1))
+    ratecnts = np.zeros((accumcnts.shape[0], accumcnts.shape[1] - 1))
     ratecnts[0, :] = accumcnts[0, 1:]
     ratecnts[1:, :] = deltacnts[1:, 1:] / deltacnts[0, 1:]
     # 
     return (accumcnts, deltacnts, ratecnts)
-    
\ No newline at end of file
+    
+
+def irucountchunks(chunks):
+    """function to compute irucounts for a series of iru channel counts given
+       in chunks, carrying the last raw counts (for roll over) and the adjusted
+       accumulated counts across chunks, so long series need not be in memory
+       input  chunks : iterable of arrays(0 to numchan, 0 to numtime) of raw counts,
+                       rows as for irucounts, consecutive in time
+       output generator of (accumcnts, deltacnts, ratecnts) for each chunk,
+              columns of each chunk in turn are those of irucounts for all chunks
+              joined (ratecnts has one fewer column than accumcnts for the
+              first chunk only)
+    """
+    last = None # last raw counts of previous chunk
+    accum = None # last adjusted accumulated counts of previous chunk
+    for chunk in chunks:
+        if (chunk.shape[1] == 0):
+            continue
+        if last is None:
+            (accumcnts, deltacnts, ratecnts) = irucounts(chunk)
+        else:
+            # same operations as irucounts, with previous raw counts prepended
+            rawcnts = np.hstack((last, chunk))
+            deltacnts = np.zeros(chunk.shape)
+            deltacnts[0, :] = rawcnts[0, 1:] - rawcnts[0, 0:-1]
+            deltacnts[1:, :] = np.int16(rawcnts[1:, 1:] - rawcnts[1:, :-1])
+            # continue cumulative sum from previous accumulated counts
+            accumcnts = chunk.copy()
+            accumcnts[1:, :] = np.hstack((accum, deltacnts[1:, :])).cumsum(axis=1)[:, 1:]
+            ratecnts = np.zeros(accumcnts.shape)
+            ratecnts[0, :] = accumcnts[0, :]
+            ratecnts[1:, :] = deltacnts[1:, :] / deltacnts[0, :]
+        last = chunk[:, -1:].copy()
+        accum = accumcnts[1:, -1:].copy()
+        yield (accumcnts, deltacnts, ratecnts)
+
+
+def windowstats(rates, lo, hi, robust=False, clip=5.0):
+    """function to compute the average & std dev of count rates over windows of
+       samples, for all windows at once from prefix sums of rate and rate^2
+       input  rates  : array(numchan, num) of count rate (counts/sec), no time row
+              lo, hi : int arrays(numwin,) of window samples lo <= index < hi
+              robust : True to reject outliers, samples further than clip times
+                       the MAD std dev (1.4826 median absolute deviation) from
+                       the median of the sorted window (none if MAD is zero)
+              clip   : outlier limit in MAD std devs
+       output (ave, std) : arrays(numchan, numwin) of average & std dev (ddof 0)
+                           of each channel in each window, NaN for an empty window
+    """
+    lo = np.asarray(lo)
+    hi = np.asarray(hi)
+    if robust:
+        ave = np.zeros((rates.shape[0], lo.shape[0]))
+        std = np.zeros((rates.shape[0], lo.shape[0]))
+        for k in range(lo.shape[0]):
+            num = hi[k] - lo[k]
+            if (num <= 0):
+                ave[:, k] = np.nan
+                std[:, k] = np.nan
+                continue
+            window = np.sort(rates[:, lo[k]:hi[k]], axis=1)
+            median = 0.5 * (window[:, (num - 1) // 2] + window[:, num // 2]).reshape(-1, 1)
+            mad = np.median(np.abs(window - median), axis=1).reshape(-1, 1)
+            limit = np.where(mad > 0.0, clip * 1.4826 * mad, np.inf)
+            keep = (np.abs(window - median) <= limit)
+            numkeep = keep.sum(axis=1)
+            ave[:, k] = (window * keep).sum(axis=1) / numkeep
+            std[:, k] = np.sqrt((((window - ave[:, k:k + 1]) * keep) ** 2).sum(axis=1) / numkeep)
+        return (ave, std)
+    # prefix sums over the samples in windows only, relative to their mean, so
+    # the large rates of maneuvers between windows do not cancel in the sums
+    inwin = rangemask(lo, hi, rates.shape[1])
+    pos = np.zeros(rates.shape[1] + 1, dtype=int) # index of each sample in the window samples
+    pos[1:] = inwin.cumsum()
+    (lo, hi) = (pos[lo], pos[hi])
+    dev = rates[:, inwin]
+    ref = dev.mean(axis=1).reshape(-1, 1)
+    dev = dev - ref
+    sums = np.zeros((rates.shape[0], dev.shape[1] + 1))
+    sums[:, 1:] = dev.cumsum(axis=1)
+    sqsums = np.zeros((rates.shape[0], dev.shape[1] + 1))
+    sqsums[:, 1:] = (dev * dev).cumsum(axis=1)
+    num = hi - lo
+    mean = (sums[:, hi] - sums[:, lo]) / num
+    var = (sqsums[:, hi] - sqsums[:, lo]) / num - mean * mean
+    return (mean + ref, np.sqrt(np.maximum(var, 0.0)))
@@ -0,0 +1,79 @@
+# iruout.py
+# Write getirudata maneuver arrays directly to a MATLAB mat-file and a NumPy
+# npz file, with the variables iruascii2mat.m saves from the text output file
+
+import os
+import datetime
+import numpy as np
+
+def j2000secs(times):
+    """Function to convert CXC times to seconds from 2000:001:12:00:00 UTC,
+       including leap seconds, as start_J2000sec in iruascii2mat.m
+       Input  times : array(num,) of CXC times (sec)
+       Output array(num,) of J2000 seconds
+    """
+    from Chandra.Time import DateTime
+    return np.asarray(times) - DateTime('2000:001:12:00:00.000').secs
+
+def datevecs(times):
+    """Function to convert CXC times to MATLAB date vectors (UTC)
+       Input  times : array(num,) of CXC times (sec)
+       Output array(num,6) of year, month, day, hours, minutes, seconds
+    """
+    from Chandra.Time import DateTime
+    dates = DateTime(np.asarray(times)).date
+    vecs = np.zeros((len(dates), 6))
+    for (n, date) in enumerate(dates):
+        (year, doy, hrs, mins, secs) = date.split(':')
+        day = datetime.date(int(year), 1, 1) + datetime.timedelta(int(doy) - 1)
+        vecs[n, :] = [day.year, day.month, day.day, int(hrs), int(mins), float(secs)]
+    return vecs
+
+def iruarrays(manvrtime, initquat, finalquat, manvrquat, intratebody, diffchancnts,
+              ini2finang, pcadbias_start, ave_bias_before_nman, ave_bias_after_nman,
+              signcode, sumprop=None, sumproprot=None):
+    """Function to arrange getirudata maneuver arrays as the variables of
+       iruascii2mat.m (one column per maneuver, MATLAB shapes)
+       Input  getirudata arrays (rows, num) with row 0 time, as written to the
+              output text file; sumprop (3,3,num) and sumproprot (3,9,num) or
+              None if not computed
+       Output dict of arrays keyed by iruascii2mat variable name, and signcode
+    """
+    out = {}
+    out['start_datevec'] = datevecs(manvrtime[0, :])
+    out['stop_datevec'] = datevecs(manvrtime[1, :])
+    out['start_J2000sec'] = j2000secs(manvrtime[0, :]).reshape(-1, 1)
+    out['stop_J2000sec'] = j2000secs(manvrtime[1, :]).reshape(-1, 1)
+    out['initquat'] = initquat[1:, :]
+    out['finalquat'] = finalquat[1:, :]
+    out['manvrquat'] = manvrquat[1:, :]
+    out['intratebody'] = intratebody[1:, :]
+    out['diffchancnt'] = diffchancnts[1:, :]
+    out['ini2fintim'] = ini2finang[0:1, :]
+    out['ini2finang'] = np.degrees(ini2finang[1:2, :])
+    if sumprop is not None:
+        out['sumprop'] = sumprop.transpose(2, 0, 1)
+        out['sumproprot'] = sumproprot.transpose(2, 0, 1)
+    out['pcadbias'] = pcadbias_start[1:, :]
+    out['cntratebiasbef'] = ave_bias_before_nman[1:, :]
+    out['cntratebiasaft'] = ave_bias_after_nman[1:, :]
+    out['signcode'] = np.asarray(signcode).reshape(1, -1)
+    return out
+
+def writeiru(basename, arrays):
+    """Function to write maneuver arrays to basename.mat and basename.npz
+       Input  basename : output file name without extension
+              arrays   : dict of arrays from iruarrays
+       Output (matfile, npzfile) names
+    """
+    import scipy.io
+    matfile = basename + '.mat'
+    npzfile = basename + '.npz'
+#   write to temporary files renamed when complete, so files are never partial
+    with open(matfile + '.tmp', 'wb') as f:
+        scipy.io.savemat(f, arrays, oned_as='row')
+    with open(npzfile + '.tmp', 'wb') as f:
+        np.savez(f, **arrays)
+    os.rename(matfile + '.tmp', matfile)
+    os.rename(npzfile + '.tmp', npzfile)
+    return (matfile, npzfile)
@@ -0,0 +1,184 @@
+# manvrcols.py
+# Column store of the per-maneuver results of getirudata, e.g. for the
+# cumulative interval (interval 99).  Each column has one value (or one
+# sub-array) per maneuver with an explicit dtype, in its own .npy file that
+# is memory mapped when first used, so the bias plots, estimator and QA tools
+# open the whole history without parsing the output text file or reading the
+# columns they do not use.  The time row of a maneuver array that repeats the
+# maneuver start, stop or duration is not stored.
+
+import os
+import json
+import numpy as np
+from manvrdefs import manvrkeys
+
+# dtype of the values of a maneuver array, float64 if not listed: channel
+# counts are integers, bias statistics & residuals need no more than float32
+coldtypes = {'diffchancnts': 'int32',
+             'ave_bias_before_nman': 'float32', 'std_bias_before_nman': 'float32',
+             'ave_bias_after_nman': 'float32', 'std_bias_after_nman': 'float32',
+             'ave_cnt_bias': 'float32', 'dif_cnt_bias': 'float32',
+             'pcadbias_start': 'float32', 'deltavect': 'float32', 'deltaYZ': 'float32'}
+
+# maneuver arrays with time row equal to a column: start & stop of manvrtime,
+# duration = stop - start
+timerows = {'initquat': 'start', 'finalquat': 'stop', 'deltaquat': 'stop',
+            'deltavect': 'stop', 'deltaYZ': 'stop', 'ini2finquat': 'duration',
+            'ini2finvect': 'duration', 'ini2finang': 'duration'}
+
+def manvrcolumns(compute_batch=True):
+    """Function to list the columns of the store
+       Input  compute_batch : True to include sumprop and sumproprot
+       Output list of (column, dtype, shape) with shape of the values of one
+              maneuver, () for a scalar; column <name>_time is the time row of
+              maneuver array name, if not in timerows
+    """
+    columns = [('nman_start', 'float64', ()), ('nman_stop', 'float64', ()),
+               ('start', 'float64', ()), ('stop', 'float64', ()), ('signcode', 'int32', ())]
+    for (name, rows) in manvrkeys:
+        if (name == 'manvrtime'):
+            continue
+        if isinstance(rows, tuple):
+            if compute_batch:
+                columns.append((name, 'float64', rows))
+            continue
+        if name not in timerows:
+            columns.append((name + '_time', 'float64', ()))
+        shape = () if (rows == 2) else (rows - 1, )
+        columns.append((name, coldtypes.get(name, 'float64'), shape))
+    return columns
+
+def tocolumns(arrays, compute_batch=True):
+    """Function to arrange getirudata maneuver arrays as columns
+       Input  arrays : dict of the arrays of manvrkeys, (rows, num) with row 0
+                       time or (3, 3, num) & (3, 9, num), nman_times (2, num)
+                       and signcode (num,); sumprop & sumproprot are not
+                       used if not compute_batch
+              compute_batch : True to include sumprop and sumproprot
+       Output columns : dict of arrays (num, ...) keyed by column
+       Raises KeyError if an array of the columns is missing or None
+    """
+    names = ['nman_times', 'signcode'] + [name for (name, rows) in manvrkeys
+                                          if compute_batch or not isinstance(rows, tuple)]
+    missing = [name for name in names if arrays.get(name) is None]
+    if missing:
+        raise KeyError('no maneuver arrays %s for the column store' % ', '.join(missing))
+    columns = {}
+    for (column, dtype, shape) in manvrcolumns(compute_batch):
+        if (column in ('nman_start', 'nman_stop')):
+            values = arrays['nman_times'][0 if (column == 'nman_start') else 1, :]
+        elif (column in ('start', 'stop')):
+            values = arrays['manvrtime'][0 if (column == 'start') else 1, :]
+        elif (column == 'signcode'):
+            values = np.asarray(arrays['signcode'])
+        elif column.endswith('_time'):
+            values = arrays[column[:-len('_time')]][0, :]
+        elif (len(shape) == 2):
+            values = np.rollaxis(arrays[column], 2)
+        else:
+            values = arrays[column][1:, :].T.reshape((-1, ) + shape)
+        if (np.dtype(dtype).kind == 'i'):
+            values = np.rint(values)
+        columns[column] = np.ascontiguousarray(values, dtype=dtype)
+    return columns
+
+def toarrays(columns):
+    """Function to arrange columns as getirudata maneuver arrays, the inverse
+       of tocolumns (exact for float64 columns)
+       Input  columns : dict (or ManvrColumns) of arrays (num, ...) keyed by column
+       Output arrays : dict of arrays (rows, num) with row 0 time or
+                       (3, 3, num) & (3, 9, num), nman_times and signcode
+    """
+    start = np.asarray(columns['start'], dtype=float)
+    stop = np.asarray(columns['stop'], dtype=float)
+    times = {'start': start, 'stop': stop, 'duration': stop - start}
+    arrays = {'nman_times': np.vstack((columns['nman_start'], columns['nman_stop'])),
+              'manvrtime': np.vstack((start, stop)),
+              'signcode': np.array(columns['signcode'])}
+    names = columns.names if isinstance(columns, ManvrColumns) else columns.keys()
+    for (name, rows) in manvrkeys:
+        if (name == 'manvrtime') or (name not in names):
+            continue
+        values = np.asarray(columns[name], dtype=float)
+        if isinstance(rows, tuple):
+            arrays[name] = np.rollaxis(values, 0, 3)
+            continue
+        if name in timerows:
+            time = times[timerows[name]]
+        else:
+            time = columns[name + '_time']
+        arrays[name] = np.vstack((time, values.reshape(values.shape[0], -1).T))
+    return arrays
+
+def writecolumns(coldir, columns, info=None):
+    """Function to write columns to directory coldir, each to a temporary
+       file renamed when complete and the index columns.json last
+       Input  coldir  : store directory (created if needed)
+              columns : dict of arrays (num, ...) keyed by column, from tocolumns
+              info    : dict of items added to the index (e.g. version, interval)
+    """
+    if not os.path.isdir(coldir):
+        os.makedirs(coldir)
+    index = dict(info or {})
+    index['num'] = 0
+    index['columns'] = []
+    for (column, values) in sorted(columns.items()):
+        filename = os.path.join(coldir, column + '.npy')
+        with open(filename + '.tmp', 'wb') as f:
+            np.save(f, values)
+        os.rename(filename + '.tmp', filename)
+        index['num'] = values.shape[0]
+        index['columns'].append({'name': column, 'dtype': values.dtype.str,
+                                 'shape': list(values.shape[1:])})
+    indexfile = os.path.join(coldir, 'columns.json')
+    with open(indexfile + '.tmp', 'w') as f:
+        json.dump(index, f, indent=1, sort_keys=True)
+    os.rename(indexfile + '.tmp', indexfile)
+
+class ManvrColumns(object):
+    """Column store of maneuver results in directory coldir, written by
+       writecolumns; a column is memory mapped (read only) when first used
+       Input  coldir : store directory
+       Attributes names : list of column names
+                  num   : number of maneuvers
+                  index : dict of the index file columns.json
+       store[column] is the array (num, ...) of a column, and
+       store.records(names) a structured array of one record per maneuver
+    """
+    def __init__(self, coldir):
+        self.coldir = coldir
+        with open(os.path.join(coldir, 'columns.json')) as f:
+            self.index = json.load(f)
+        self.names = [column['name'] for column in self.index['columns']]
+        self.num = self.index['num']
+        self.columns = {}
+
+    def __getitem__(self, column):
+        if column not in self.columns:
+            if column not in self.names:
+                raise KeyError('%s: no column %s' % (self.coldir, column))
+            self.columns[column] = np.load(os.path.join(self.coldir, column + '.npy'),
+                                           mmap_mode='r')
+        return self.columns[column]
+
+    def __contains__(self, column):
+        return column in self.names
+
+    def dtype(self, names=None):
+        """Function to return the structured dtype of records of columns
+           Input  names : list of columns, None for all
+        """
+        specs = dict((column['name'], column) for column in self.index['columns'])
+        return np.dtype([(str(name), str(specs[name]['dtype']), tuple(specs[name]['shape']))
+                         for name in (names or self.names)])
+
+    def records(self, names=None):
+        """Function to read columns as a structured array
+           Input  names : list of columns, None for all
+           Output array(num,) of records with a field for each column
+        """
+        names = names or self.names
+        recs = np.zeros(self.num, dtype=self.dtype(names))
+        for name in names:
+            recs[name] = self[name]
+        return recs
@@ -0,0 +1,270 @@
+# manvrdefs.py
+# Maneuver computations for IRU calibration
+
+from collections import deque
+import numpy as np
+from quatdefs import vect2quat, quatmult, quatconj, quatnorm, quat2vect, quat2mat, \
+                     vectmag, quatxaber, quatcumprod, qconj, q2rotmats
+import irudefs as iru
+from runprofile import Profile, noprofile
+
+# Per-maneuver quantities returned by manvrcalc, as (name, rows) with rows
+# the number of values per maneuver or (3, 3) & (3, 9) for the batch sums
+manvrkeys = [('initquat', 5), ('finalquat', 5), ('manvrquat', 5), ('manvrtime', 2),
+             ('intratebody', 4), ('diffchancnts', 5),
+             ('ave_bias_before_nman', 5), ('std_bias_before_nman', 5),
+             ('ave_bias_after_nman', 5), ('std_bias_after_nman', 5),
+             ('ave_cnt_bias', 5), ('dif_cnt_bias', 5),
+             ('ini2finquat', 5), ('ini2finvect', 4), ('ini2finang', 2),
+             ('finalpropquat', 5), ('deltaquat', 5), ('deltavect', 4), ('deltaYZ', 2),
+             ('pcadbias_start', 4), ('sumprop', (3, 3)), ('sumproprot', (3, 9))]
+
+scan_min = 20000 # number of rates from which propagation uses the blocked scan
+scan_block = 32 # block size of the blocked scan (quatdefs.qscan)
+
+def manvrprop(angratebody, idx_begin, idx_end, compute_batch=True):
+    """Function to propagate the maneuver rotation with body rates for all
+       rate samples at once, replacing a loop over each rate sample
+       Input  angratebody : array(4,num) of time & body rates (rad/sec)
+              idx_begin   : index of first rate after the initial quaternion
+              idx_end     : index of last rate up to the final quaternion
+              compute_batch : True to compute sumprop and sumproprot
+       Output manvrquat   : quaternion(5,), time of last rate and rotation
+                            from initial to final attitude
+              intratebody : array(4,), accumulated time and integrated body rates
+              sumprop     : array(3,3), sum of prop-mat times delta time
+              sumproprot  : array(3,9), sum of prop-mat-func(rate)
+              propquat    : quaternion(5,numrate), maneuver rotation at each rate time
+       sumprop and sumproprot are in the initial frame and None if not compute_batch
+    """
+    rtime = angratebody[0, idx_begin:(idx_end + 1)]
+    deltatime = rtime - angratebody[0, (idx_begin - 1):idx_end]
+    rotvec = np.zeros((4, rtime.shape[0])) # rotation vector for each interval
+    rotvec[0, ] = rtime
+    rotvec[1:, ] = angratebody[1:, idx_begin:(idx_end + 1)] * deltatime
+
+    intratebody = np.zeros(4)
+    intratebody[0] = deltatime.sum() # accumulated time
+    intratebody[1:] = rotvec[1:, ].sum(axis = 1) # integrated body rates
+
+    block = scan_block if (rtime.shape[0] >= scan_min) else None # blocked scan for long maneuvers
+    propquat = quatcumprod(vect2quat(rotvec), block) # propagated maneuver quat at each rate
+    manvrquat = propquat[:, -1].copy()
+
+    if compute_batch:
+        rotmat = q2rotmats(qconj(propquat[1:, ])) # rotmats from current to initial
+        sumprop = (rotmat * deltatime).sum(axis = 2)
+#       rotmat * [[v 0 0], [0 v 0], [0 0 v]] summed over rates, v = rotvec row
+        sumproprot = np.dot(rotmat.reshape(9, -1), rotvec[1:, ].T).reshape(3, 9)
+    else:
+        sumprop = None
+        sumproprot = None
+
+    return (manvrquat, intratebody, sumprop, sumproprot, propquat)
+
+def lastindex(times, t, inclusive=False):
+    """Function to find the index of the last time before t with a binary search
+       Input  times : array(num,) of times, ascending
+              t     : float; time
+              inclusive : True for time <= t, False for time < t
+       Output int index; ValueError if no time is before t
+    """
+    k = np.searchsorted(times, t, 'right' if inclusive else 'left') - 1
+    if (k < 0):
+        raise ValueError('no time before %.3f' % t)
+    return k
+
+def firstindex(times, t, inclusive=False):
+    """Function to find the index of the first time after t with a binary search
+       Input  times : array(num,) of times, ascending
+              t     : float; time
+              inclusive : True for time >= t, False for time > t
+       Output int index; ValueError if no time is after t
+    """
+    k = np.searchsorted(times, t, 'left' if inclusive else 'right')
+    if (k >= times.shape[0]):
+        raise ValueError('no time after %.3f' % t)
+    return k
+
+def manvrcalc(pcadquat, accumcnts, pcadbias, cxovel, nman_start, kalm_start, conv_time,
+              irumodel, use_ave_bias=False, compute_batch=True, keep_data=False, profile=False, robust_bias=False):
+    """Function to compute the calibration quantities of one maneuver
+       Input  pcadquat  : array(5,num) of time & PCAD quaternion, NPNT before to NPNT after
+              accumcnts : array(5,num) of time & accumulated counts with roll-over
+              pcadbias  : array(4,num) of time & PCAD 3-vector bias (rad/sec)
+              cxovel    : array(4,num) of time & CXO velocity wrt Sun (km/sec),
+                          None for no aberration adjustment
+              nman_start : float; NMAN start time (sec)
+              kalm_start : float; last Kalman start time in NPNT after NMAN (sec)
+              conv_time  : float; Kalman filter converge time (sec)
+              irumodel   : irudefs.IruModel of the M-matrix epoch of the maneuver
+              use_ave_bias : True for average count bias, False for PCAD bias
+              compute_batch : True to compute sumprop and sumproprot
+              keep_data : True to also return the time series used for plots
+              profile : True to time the irucounts, irurates & propagation stages
+              robust_bias : True to reject outliers of count rates before & after
+                            maneuver from the bias statistics (irudefs.windowstats)
+       Output res : dict with a value for each name in manvrkeys (sumprop and
+                    sumproprot None if not compute_batch), and when keep_data
+                    is True pcadquat, rawcnts, accumcnts, ratecnts, angratechan,
+                    angratebody, propdeltquat; when profile is True timers, dict
+                    of [sec, calls] keyed by stage (see runprofile.Profile)
+    """
+    res = {}
+    prof = Profile() if profile else noprofile
+
+#   Adjust pcad quaternion for velocity aberration, velocity interpolated
+#   to the time of each PCAD quaternion
+    if cxovel is not None:
+        pcadquat = quatxaber(pcadquat, cxovel, interp=True)
+
+#   find last NPNT attitude quaternion before NMAN
+    initquat = pcadquat[:, lastindex(pcadquat[0, :], nman_start)].copy()
+
+#   find final NPNT attitude quaternion after Kalman converges
+    finalquat = pcadquat[:, firstindex(pcadquat[0, :], kalm_start + conv_time)].copy()
+    manvrtime = np.array([initquat[0], finalquat[0]])
+
+#   compute rotation quaternion and maneuver eigen axis & angle
+    ini2finquat = quatnorm(quatmult(quatconj(initquat), finalquat))[:, 0]
+    ini2finquat[0] = manvrtime[1] - manvrtime[0]
+    ini2finvect = quat2vect(ini2finquat)[:, 0]
+    ini2finang = np.array([ini2finvect[0], vectmag(ini2finvect[1:])])
+
+#   compute delta-time and delta-counts & adjust for roll-over
+    num_cnts = accumcnts.shape[1]
+    rawcnts = accumcnts
+    with prof.timer('irucounts'):
+        (accumcnts, deltacnts, ratecnts) = iru.irucounts(accumcnts)
+
+#   compute the difference in channel counts (and time) across maneuver
+    start_index = lastindex(accumcnts[0, :], initquat[0] + 0.01, inclusive=True)
+    stop_index = firstindex(accumcnts[0, :], finalquat[0] - 0.01, inclusive=True)
+    diffchancnts = accumcnts[:, stop_index] - accumcnts[:, start_index]
+
+#   compute average rate per channel & std (bias in cnts/sec) before maneuver,
+#   samples 0 to last before NMAN, and after maneuver, samples first after
+#   final quaternion to last, for both windows at once
+    before_stop = lastindex(accumcnts[0, :], nman_start)
+    after_start = firstindex(accumcnts[0, :], finalquat[0])
+    (ave_bias, std_bias) = iru.windowstats(ratecnts[1:, :], [0, after_start],
+                                           [before_stop, num_cnts - 1], robust_bias)
+    ave_bias_before_nman = np.zeros(5)
+    std_bias_before_nman = np.zeros(5)
+    ave_bias_before_nman[0] = accumcnts[0, before_stop] # stop time of bias
+    ave_bias_before_nman[1:] = ave_bias[:, 0]
+    std_bias_before_nman[0] = accumcnts[0, before_stop] # stop time of bias
+    std_bias_before_nman[1:] = std_bias[:, 0]
+
+    ave_bias_after_nman = np.zeros(5)
+    std_bias_after_nman = np.zeros(5)
+    ave_bias_after_nman[0] = accumcnts[0, after_start] # start time of bias
+    ave_bias_after_nman[1:] = ave_bias[:, 1]
+    std_bias_after_nman[0] = accumcnts[0, after_start] # start time of bias
+    std_bias_after_nman[1:] = std_bias[:, 1]
+
+#   Compute average bias for maneuver (cnts/sec)
+    ave_cnt_bias = (ave_bias_before_nman + ave_bias_after_nman) / 2.0
+#   Compute the difference in bias between before and after
+    dif_cnt_bias = np.zeros(5)
+    dif_cnt_bias[0] = (ave_bias_before_nman[0] + ave_bias_after_nman[0]) / 2.0
+    dif_cnt_bias[1:] = ave_bias_before_nman[1:] - ave_bias_after_nman[1:]
+
+#   get first NMAN bias
+    pcadbias_start = pcadbias[:, firstindex(pcadbias[0, :], nman_start, inclusive=True)].copy()
+
+#   compute 3-vector angular rate (rad/sec)
+#   set bias
+    if use_ave_bias:
+        Bias4 = ave_cnt_bias[1:]
+        Bias3 = np.zeros((3,1))
+    else:
+        Bias4 = np.zeros((4,1))
+        Bias3 = pcadbias_start[1:]
+
+#   compute angular rate
+    with prof.timer('irurates'):
+        (angratechan, angratebody) = irumodel.rates(Bias4, Bias3, ratecnts)
+
+#   adjust time of rate
+    if keep_data:
+        res['angratechan'] = angratechan
+    angratebody[1:, :-1] = angratebody[1:, :-1] * 0.75 + angratebody[1:, 1:] * 0.25
+
+#   propagated maneuver rates
+    idx_begin = firstindex(angratebody[0, :], initquat[0]) # index of first angratebody at time after initial quaternion
+    idx_end = lastindex(angratebody[0, :] - 0.01, finalquat[0], inclusive=True) # index of last angratebody upto time of final quaternion
+    with prof.timer('propagation'):
+        (manvrquat, intratebody, sumprop, sumproprot, propquat) = \
+            manvrprop(angratebody, idx_begin, idx_end, compute_batch)
+
+#   Compute final quaternion by propagation with rates
+    finalpropquat = quatnorm(quatmult(initquat, manvrquat))[:, 0]
+
+#   Compute final sums of propagation...
+    rotmat = quat2mat(manvrquat) # rotation matrix from initial to final
+    if compute_batch:
+        sumprop = np.dot(rotmat, sumprop)
+        sumproprot = np.dot(rotmat, sumproprot)
+
+#   Compute delta quaternion between propagation and solution
+    deltaquat = quatnorm(quatmult(quatconj(finalpropquat), finalquat))[:, 0]
+    deltavect = quat2vect(deltaquat)[:, 0]
+    deltaYZ = np.array([manvrtime[1], np.sqrt((deltavect[2:] * deltavect[2:]).sum(axis = 0))])
+
+    res.update(initquat = initquat, finalquat = finalquat, manvrquat = manvrquat,
+               manvrtime = manvrtime, intratebody = intratebody, diffchancnts = diffchancnts,
+               ave_bias_before_nman = ave_bias_before_nman,
+               std_bias_before_nman = std_bias_before_nman,
+               ave_bias_after_nman = ave_bias_after_nman,
+               std_bias_after_nman = std_bias_after_nman,
+               ave_cnt_bias = ave_cnt_bias, dif_cnt_bias = dif_cnt_bias,
+               ini2finquat = ini2finquat, ini2finvect = ini2finvect, ini2finang = ini2finang,
+               finalpropquat = finalpropquat, deltaquat = deltaquat, deltavect = deltavect,
+               deltaYZ = deltaYZ, pcadbias_start = pcadbias_start,
+               sumprop = sumprop, sumproprot = sumproprot)
+
+    if keep_data:
+#       delta quat through maneuver: propagated attitude to pcad quaternion
+#       within 0.1 sec of each propagated quaternion, if only one
+        propquat = quatmult(initquat, propquat)
+        timidx0 = np.searchsorted(pcadquat[0, :], propquat[0, :] - 0.1, 'right')
+        timidx1 = np.searchsorted(pcadquat[0, :], propquat[0, :] + 0.1, 'left')
+        ix = ((timidx1 - timidx0) == 1)
+        propdeltquat = quatnorm(quatmult(quatconj(propquat[:, ix]), pcadquat[:, timidx0[ix]]))
+        res['propdeltquat'] = propdeltquat[:, (propdeltquat[0, :] > 0)]
+        res['pcadquat'] = pcadquat
+        res['rawcnts'] = rawcnts
+        res['accumcnts'] = accumcnts
+        res['ratecnts'] = ratecnts
+        res['angratebody'] = angratebody
+
+    if profile:
+        res['timers'] = prof.timers
+
+    return res
+
+def manvrcalc_kw(kwargs):
+    """Function to call manvrcalc with a dict of arguments, for use with
+       poolmap
+    """
+    return manvrcalc(**kwargs)
+
+def poolmap(pool, func, argsiter, lookahead):
+    """Function to call func in the processes of a multiprocessing.Pool for
+       each item of argsiter.  Items are taken from argsiter on the calling
+       thread, when lookahead calls or fewer are pending, so that archive
+       fetches and profile timers of argsiter stay on that thread.
+       Input  pool      : multiprocessing.Pool
+              func      : function of one argument
+              argsiter  : iterable of arguments of func
+              lookahead : number of calls pending after a result is returned
+       Output generator of the results in the order of argsiter
+    """
+    pending = deque()
+    for args in argsiter:
+        pending.append(pool.apply_async(func, (args, )))
+        if (len(pending) > lookahead):
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
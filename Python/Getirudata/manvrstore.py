@@ -0,0 +1,104 @@
+# manvrstore.py
+# Persistent store of the per-maneuver arrays of getirudata, for incremental
+# processing of a cumulative interval (interval 99).  Maneuvers are kept in
+# order of NMAN start time, in one npz file for each configuration hash, so
+# results computed with other M-matrices, aberration or bias options are
+# never merged.  Only maneuvers after the high-water mark, the latest stored
+# NMAN start, need to be fetched and computed on each run.
+
+import os
+import hashlib
+import numpy as np
+from arraydata import IntervalSet
+
+def confighash(config):
+    """Function to compute a hash of the configuration of maneuver computations
+       Input  config : dict of scalars, strings and arrays (None for unused)
+       Output hex string of the SHA-1 hash; arrays are hashed by shape & values
+    """
+    sha = hashlib.sha1()
+    for key in sorted(config.keys()):
+        value = config[key]
+        sha.update(key)
+        if isinstance(value, np.ndarray):
+            value = np.ascontiguousarray(value, dtype=float)
+            sha.update(repr(value.shape))
+            sha.update(value.tostring())
+        else:
+            sha.update(repr(value))
+    return sha.hexdigest()
+
+class ManvrStore(object):
+    """Store of maneuver arrays, (rows, num) or (rows, cols, num) with one
+       column per maneuver, in file storedir/manvrstore_<label>_<hash>.npz
+       Input  storedir : directory of the store (created if needed)
+              label    : string; interval and version label of the file name
+              config   : dict of the configuration, see confighash
+       Arrays are in attribute arrays, with nman_times (2,num) of NMAN start &
+       stop and nman_windows (2,num) of NPNT before start & NPNT after stop.
+       num_nman0 is the number of input NMAN intervals up to the high-water mark.
+    """
+    def __init__(self, storedir, label, config):
+        self.hash = confighash(config)
+        if not os.path.isdir(storedir):
+            os.makedirs(storedir)
+        self.filename = os.path.join(storedir, 'manvrstore_%s_%s.npz' % (label, self.hash[:12]))
+        self.arrays = {}
+        self.num_nman0 = 0
+        if os.path.exists(self.filename):
+            data = np.load(self.filename)
+            self.num_nman0 = int(data['num_nman0'])
+            self.arrays = dict((name, data[name]) for name in data.files if name != 'num_nman0')
+
+    def num(self):
+        """Function to return the number of stored maneuvers
+        """
+        if 'nman_times' in self.arrays:
+            return self.arrays['nman_times'].shape[1]
+        return 0
+
+    def highwater(self):
+        """Function to return the latest stored NMAN start time, None if empty
+        """
+        if self.num() == 0:
+            return None
+        return self.arrays['nman_times'][0, -1]
+
+    def append(self, arrays, nman_starts):
+        """Function to append maneuvers after the high-water mark and save the store
+           Input  arrays : dict of maneuver arrays, the last axis is maneuver,
+                           including nman_times and nman_windows
+                  nman_starts : array(num,) of start times of all input NMAN
+                                intervals after the previous high-water mark
+        """
+        if self.num() > 0:
+            for name in arrays:
+                self.arrays[name] = np.concatenate((self.arrays[name], arrays[name]), axis=-1)
+        else:
+            self.arrays = dict((name, np.array(arrays[name])) for name in arrays)
+        highwater = self.highwater()
+        if highwater is not None:
+            self.num_nman0 += int((nman_starts <= highwater).sum())
+        self.save()
+
+    def save(self):
+        """Function to write the store, to a temporary file renamed over the
+           store so an interrupted run leaves the previous store
+        """
+        tmpname = self.filename + '.tmp'
+        with open(tmpname, 'wb') as f:
+            np.savez(f, num_nman0=self.num_nman0, **self.arrays)
+        os.rename(tmpname, self.filename)
+
+    def notbad(self, bad_times):
+        """Function to select stored maneuvers outside bad time intervals,
+           as for new maneuvers: no bad start or stop in the NPNT-NMAN-NPNT
+           window and window not within a bad interval
+           Input  bad_times : array(2,num_bad) of bad start and stop times
+           Output bool array(num,); True for maneuvers to keep
+        """
+        window_set = IntervalSet(self.arrays['nman_windows'])
+        keep = ~window_set.containsany(bad_times[0, :])
+        keep &= ~window_set.containsany(bad_times[1, :])
+        keep &= ~window_set.within(IntervalSet(bad_times))
+        return keep
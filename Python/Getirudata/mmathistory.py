@@ -0,0 +1,72 @@
+# mmathistory.py
+# On-board M-matrix uplink history read from a data file (mmat_history.dat),
+# so an uplink is added to the file rather than to each program.  The M-matrix
+# in use at any number of times is found with one searchsorted on the uplink
+# times and gathered for all times at once, and the IRU rate model of each
+# uplink epoch is made once for the maneuvers of the epoch.
+
+import numpy as np
+import irudefs as iru
+
+class MmatHistory(object):
+    """On-board M-matrix uplink history
+       Input  filename : history file, one uplink per line with uplink time
+                         (YYYY:DOY:HH:MM:SS.sss), label and the 9 values of the
+                         M-matrix by row, in time order; text after # is a comment
+              datesecs : function converting an uplink time string to seconds
+                         in the time system of the caller
+       Attributes dates  : list of uplink time strings
+                  labels : list of uplink labels
+                  times  : array(num,) of uplink times (sec)
+                  arrays : array(3,3,num) of M-matrix uplinked at each time
+    """
+    def __init__(self, filename, datesecs):
+        self.filename = filename
+        self.dates = []
+        self.labels = []
+        values = []
+        for line in open(filename, 'rU'):
+            fields = line.split('#')[0].split()
+            if not fields:
+                continue
+            if (len(fields) != 11):
+                raise ValueError('%s: uplink line needs time, label and 9 values: %s'
+                                 % (filename, line.strip()))
+            self.dates.append(fields[0])
+            self.labels.append(fields[1])
+            values.append([float(x) for x in fields[2:11]])
+        self.times = np.array([datesecs(date) for date in self.dates])
+        self.arrays = np.array(values).reshape(-1, 3, 3).transpose(1, 2, 0).copy()
+        if (np.diff(self.times) <= 0).any():
+            raise ValueError('%s: uplink times are not in ascending order' % filename)
+
+    def epochs(self, times):
+        """Function to find the uplink in use at each time
+           Input  times : array(n,) of times (sec)
+           Output int array(n,) of uplink index, -1 before the first uplink
+        """
+        return np.searchsorted(self.times, times, 'right') - 1
+
+    def gather(self, times):
+        """Function to gather the M-matrix in use at each time
+           Input  times : array(n,) of times (sec)
+           Output array(3,3,n); zeros before the first uplink
+        """
+        arrays = np.concatenate((np.zeros((3, 3, 1)), self.arrays), axis=2)
+        return arrays.take(self.epochs(times) + 1, axis=2)
+
+    def select(self, time):
+        """Function to select the M-matrix in use at a time
+           Input  time : float; time (sec)
+           Output Mmat : array(3,3); zeros before the first uplink
+        """
+        return self.gather(np.array([time]))[:, :, 0]
+
+    def models(self, Dmat, Gmat, SFact):
+        """Function to make the IRU rate model of each uplink epoch
+           Input  Dmat, Gmat, SFact : calibration arrays for irudefs.IruModel
+           Output list of irudefs.IruModel, item epoch + 1 for the epochs of
+                  epochs(), item 0 with zero M-matrix before the first uplink
+        """
+        arrays = np.concatenate((np.zeros((3, 3, 1)), self.arrays), axis=2)
+        return [iru.IruModel(Dmat, arrays[:, :, k], Gmat, SFact) for k in range(arrays.shape[2])]
@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+# plotbundle.py
+# Plot data of the getirudata and aoatter figures, collected by the computation
+# in a bundle and drawn afterwards: to png files with the Agg renderer in a
+# process pool, which needs no X display, or in pyplot figures for review.
+# Time series are reduced to the minimum & maximum in each pixel column.
+# A bundle file is rendered with
+#   python plotbundle.py bundle.npz [--num-proc N] [--outdir DIR]
+
+import os
+import json
+import argparse
+import multiprocessing
+import numpy as np
+
+figsize = (8.0, 6.0) # figure size (inches)
+dpi = 100 # resolution of png files (pixels/inch)
+
+def decimate(x, y, npix):
+    """Function to reduce a time series to its min/max envelope, the minimum
+       and maximum of y in each of npix equal bins of x
+       Input  x : array(num,) of times in ascending order
+              y : array(num,) of values
+              npix : int; number of bins, pixel columns of the plot
+       Output (x, y) : arrays of the points at the minimum & maximum in each
+                       bin, in time order; x & y if num <= 2 * npix
+    """
+    num = x.shape[0]
+    if (num <= 2 * npix) or (x[-1] <= x[0]):
+        return (x, y)
+    binnum = np.floor((x - x[0]) / (x[-1] - x[0]) * npix).astype(int)
+    binnum[binnum == npix] = npix - 1
+#   points sorted by bin, then value; first and last of each bin are min & max
+    order = np.lexsort((y, binnum))
+    first = np.flatnonzero(np.diff(binnum[order])) + 1
+    idx = np.union1d(order[np.r_[0, first]], order[np.r_[first - 1, num - 1]])
+    return (x[idx], y[idx])
+
+class PlotBundle(object):
+    """Figures of plot data, each a dict with num (figure number), filename
+       (png file, None for no file), title, xlabel, ylabel, legend, ylim
+       (lower & upper limit, None for automatic), yextend (added to the
+       automatic upper limit) and a list of series.  A series is a dict with
+       kind ('cxctime', 'plot' or 'hist'), x, y and fmt (or bins for hist).
+       Input  npix : number of pixel columns for decimation of time series,
+                     0 for no decimation
+    """
+    def __init__(self, npix=int(figsize[0] * dpi)):
+        self.npix = npix
+        self.figures = []
+
+    def figure(self, num, filename, title, xlabel, ylabel, legend=None, ylim=None, yextend=0.0):
+        """Function to start a new figure, series are added to the last figure
+        """
+        self.figures.append(dict(num=num, filename=filename, title=title, xlabel=xlabel,
+                                 ylabel=ylabel, legend=legend, ylim=ylim, yextend=yextend,
+                                 series=[]))
+
+    def plot_cxctime(self, times, y, fmt='-b', decim=True, fig=-1):
+        """Function to add a time series, decimated to the min/max envelope
+           unless decim is False (full resolution for zooming in review),
+           to figure index fig of the bundle (default the last)
+        """
+        if decim and (self.npix > 0):
+            (times, y) = decimate(np.asarray(times), np.asarray(y), self.npix)
+        self.figures[fig]['series'].append(dict(kind='cxctime', x=times, y=y, fmt=fmt))
+
+    def plot(self, x, y, fmt='-b', fig=-1):
+        """Function to add a series of y versus x
+        """
+        self.figures[fig]['series'].append(dict(kind='plot', x=x, y=y, fmt=fmt))
+
+    def hist(self, x, bins=10, fig=-1):
+        """Function to add a histogram of x
+        """
+        self.figures[fig]['series'].append(dict(kind='hist', x=x, y=None, bins=bins))
+
+    def save(self, filename):
+        """Function to write the bundle to an npz file, figures without series
+           arrays in json string spec, series arrays as f<figure>s<series><x|y>
+        """
+        spec = []
+        arrays = {}
+        for (k, fig) in enumerate(self.figures):
+            figspec = dict(fig, series=[])
+            for (n, series) in enumerate(fig['series']):
+                name = 'f%ds%d' % (k, n)
+                arrays[name + 'x'] = np.asarray(series['x'])
+                if series['y'] is not None:
+                    arrays[name + 'y'] = np.asarray(series['y'])
+                figspec['series'].append(dict((key, val) for (key, val) in series.items()
+                                              if key not in ('x', 'y')))
+            spec.append(figspec)
+        np.savez(filename, spec=json.dumps(spec), **arrays)
+
+    @classmethod
+    def load(cls, filename):
+        """Function to read a bundle written by save
+        """
+        data = np.load(filename)
+        bundle = cls()
+        bundle.figures = json.loads(str(data['spec']))
+        for (k, fig) in enumerate(bundle.figures):
+            for (n, series) in enumerate(fig['series']):
+                name = 'f%ds%d' % (k, n)
+                series['x'] = data[name + 'x']
+                series['y'] = data[name + 'y'] if (name + 'y') in data.files else None
+        return bundle
+
+def drawfigure(fig, mplfig, ax):
+    """Function to draw the series of a bundle figure on matplotlib axes
+    """
+    from Ska.Matplotlib import plot_cxctime
+    for series in fig['series']:
+        if series['kind'] == 'cxctime':
+            plot_cxctime(series['x'], series['y'], series['fmt'], fig=mplfig, ax=ax,
+                         interactive=False)
+        elif series['kind'] == 'plot':
+            ax.plot(series['x'], series['y'], series['fmt'])
+        else:
+            ax.hist(series['x'], series['bins'])
+    ax.set_title(fig['title'])
+    ax.set_xlabel(fig['xlabel'])
+    ax.set_ylabel(fig['ylabel'])
+    (ylo, yhi) = ax.get_ylim()
+    if fig['ylim'] is not None:
+        if fig['ylim'][0] is not None:
+            ylo = fig['ylim'][0]
+        if fig['ylim'][1] is not None:
+            yhi = fig['ylim'][1]
+    ax.set_ylim(ylo, yhi + fig['yextend'])
+    ax.grid(True)
+    if fig['legend'] is not None:
+        ax.legend(fig['legend'], loc='best')
+
+def renderfigure(args):
+    """Function to draw a bundle figure with the Agg renderer to its png file
+       Input  args : tuple of figure and output directory
+       Output png file name
+    """
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    (fig, outdir) = args
+    mplfig = Figure(figsize=figsize, dpi=dpi)
+    FigureCanvasAgg(mplfig)
+    drawfigure(fig, mplfig, mplfig.add_subplot(111))
+    filename = os.path.join(outdir, fig['filename'])
+    mplfig.savefig(filename, dpi=dpi)
+    return filename
+
+def render(bundle, num_proc=1, outdir='.'):
+    """Function to write png files of the bundle figures with a filename,
+       in num_proc worker processes
+       Output list of png file names
+    """
+    figs = [(fig, outdir) for fig in bundle.figures if fig['filename'] is not None]
+    if (num_proc > 1) and (len(figs) > 1):
+        pool = multiprocessing.Pool(min(num_proc, len(figs)))
+        filenames = pool.map(renderfigure, figs)
+        pool.close()
+        pool.join()
+    else:
+        filenames = [renderfigure(args) for args in figs]
+    return filenames
+
+def show(bundle):
+    """Function to draw the bundle figures in pyplot figures for review
+    """
+    import matplotlib.pyplot as plt
+    for fig in bundle.figures:
+        mplfig = plt.figure(fig['num'], figsize=figsize)
+        mplfig.clf()
+        drawfigure(fig, mplfig, mplfig.add_subplot(111))
+        plt.draw()
+    plt.show(block=False)
+
+def get_opt():
+    parser = argparse.ArgumentParser(description='Render a plot bundle to png files')
+    parser.add_argument('bundle', type=str,
+                        help='Plot bundle npz file')
+    parser.add_argument('--num-proc', type=int,
+                        default=multiprocessing.cpu_count(),
+                        help='Number of rendering processes (default=number of CPUs)')
+    parser.add_argument('--outdir', type=str,
+                        default='.',
+                        help='Directory of png files (default=.)')
+    opt = parser.parse_args()
+    return opt
+
+if __name__ == '__main__':
+    opt = get_opt()
+    for filename in render(PlotBundle.load(opt.bundle), opt.num_proc, opt.outdir):
+        print filename
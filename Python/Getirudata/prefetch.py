@@ -0,0 +1,106 @@
+# prefetch.py
+# Fetch each MSID group once for a block of maneuver time windows and
+# hand each maneuver a slice of the block data, instead of one archive
+# fetch per group per maneuver.
+
+import numpy as np
+
+def windowblocks(wintimes, max_span):
+    """Function to group consecutive time windows into blocks spanning
+       no more than max_span seconds (a single longer window is its own block)
+       Input  wintimes : array(2,num) of window start (0) and stop (1) times,
+                         ordered by start time
+              max_span : float; maximum time span of a block (sec)
+       Output blocknum : int array(num,) of block number for each window
+    """
+    num = wintimes.shape[1]
+    blocknum = np.zeros(num, dtype=int)
+    block_start = wintimes[0, 0] if num > 0 else 0.0
+    for n in range(1, num):
+        if (wintimes[1, n] - block_start) > max_span:
+            blocknum[n] = blocknum[n - 1] + 1
+            block_start = wintimes[0, n]
+        else:
+            blocknum[n] = blocknum[n - 1]
+    return blocknum
+
+def fetchgroup(msids, tstart, tstop, filter_bad=True, fetcher=None):
+    """Function to fetch a group of MSIDs into a single array
+       Input  msids  : list of MSID names sharing the time stamps of msids[0]
+              tstart : start time (DateTime compatible)
+              tstop  : stop time (DateTime compatible)
+              fetcher : object with an MSIDset function, fetch or a FetchCache,
+                        None for fetch (imported on first use)
+       Output data : array(1+nummsid, num), row 0 time of msids[0],
+                     rows 1 to nummsid values of each MSID
+    """
+    if fetcher is None:
+        import Ska.engarchive.fetch as fetcher
+    data = fetcher.MSIDset(msids, tstart, tstop, filter_bad=filter_bad)
+    for msid in msids[1:]:
+        if (len(data[msid].vals) != len(data[msids[0]].times)):
+            raise ValueError('%s has %d samples, %s has %d: not the same time stamps'
+                             % (msid, len(data[msid].vals), msids[0], len(data[msids[0]].times)))
+    rows = [data[msids[0]].times]
+    rows.extend([data[msid].vals for msid in msids])
+    return np.array(rows)
+
+def fetchchunks(msids, tstart, tstop, chunk_span, filter_bad=True, fetcher=None):
+    """Function to fetch a group of MSIDs in consecutive time spans, for
+       processing long time intervals a chunk at a time
+       Input  msids  : list of MSID names sharing the time stamps of msids[0]
+              tstart : float; start time (sec)
+              tstop  : float; stop time (sec)
+              chunk_span : float; time span of each fetch (sec)
+              fetcher : object with an MSIDset function, fetch or a FetchCache
+       Output generator of array(1+nummsid, num) as from fetchgroup for each span
+    """
+    for t0 in np.arange(tstart, tstop, chunk_span):
+        yield fetchgroup(msids, t0, min(t0 + chunk_span, tstop), filter_bad=filter_bad,
+                         fetcher=fetcher)
+
+def getwindow(data, tstart, tstop):
+    """Function to return the samples of a prefetched array in a time window
+       without copying; uses the archive convention tstart <= time < tstop
+       Input  data   : array(rows, num), row 0 time sorted ascending
+              tstart : float; window start time (sec)
+              tstop  : float; window stop time (sec)
+       Output view of data[:, i0:i1]
+    """
+    (i0, i1) = np.searchsorted(data[0, :], [tstart, tstop])
+    return data[:, i0:i1]
+
+class Prefetch(object):
+    """Prefetched MSID group for a set of maneuver time windows.
+       Data for all windows in a block (see windowblocks) is fetched with one
+       archive call when the first window of the block is requested; only the
+       current block is kept in memory.
+       Input  msids    : list of MSID names sharing the time stamps of msids[0]
+              wintimes : array(2,num) of window start and stop times (sec)
+              max_span : float; maximum time span of one fetch (sec)
+              pad      : float; extend each window by pad before and after (sec)
+              fetcher  : object with an MSIDset function, fetch or a FetchCache
+    """
+    def __init__(self, msids, wintimes, max_span, pad=0.0, filter_bad=True, fetcher=None):
+        self.msids = msids
+        self.fetcher = fetcher
+        self.wintimes = wintimes
+        self.pad = pad
+        self.filter_bad = filter_bad
+        self.blocknum = windowblocks(wintimes, max_span)
+        self.block = None
+        self.data = None
+
+    def window(self, n):
+        """Function to return the data for window n as a view of the block data
+           Output array(1+nummsid, num) for tstart - pad <= time < tstop + pad
+        """
+        if self.blocknum[n] != self.block:
+            self.block = self.blocknum[n]
+            inblock = (self.blocknum == self.block)
+            self.data = fetchgroup(self.msids,
+                                   self.wintimes[0, inblock].min() - self.pad,
+                                   self.wintimes[1, inblock].max() + self.pad,
+                                   filter_bad=self.filter_bad, fetcher=self.fetcher)
+        return getwindow(self.data, self.wintimes[0, n] - self.pad,
+                         self.wintimes[1, n] + self.pad)
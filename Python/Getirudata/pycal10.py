@@ -0,0 +1,204 @@
+#!/usr/bin/env python
+# pycal10.py
+# Python version of the Davenport forward/backward 9-parameter Kalman filter
+# of matpycal10.m, for the IRU calibration M-matrix from getirudata arrays.
+# Input arrays are those of iruout.iruarrays (the variables of the mat-file
+# read by matpycal10.m), passed in memory or read from the npz file.
+# The 12-parameter (alpha) filter and plots of matpycal10.m are not included.
+
+import os
+import sys
+import datetime
+import numpy as np
+from quatdefs import quatmult, quatconj, quat2vect, quat2mats
+from mmathistory import MmatHistory
+
+# units
+rad = 1.0
+deg = np.pi / 180.0 # deg to rad conversion
+asec = deg / 3600.0 # arcsec to rad conversion
+sec = 1.0
+hr = 3600.0 * sec # hour to second conversion
+day = 24.0 * hr
+
+# noise models, as matpycal10.m
+attstd = np.array([10.0, 0.1, 0.1]) * asec # initial attitude standard deviation
+Patt = np.diag(attstd) ** 2
+sig_d = 2.5 * asec # digital uncertainty per axis
+sig_v = 4.3E-4 * deg / hr ** 0.5 # gyro white noise
+sig_b = 1.0E-7 * deg / sec # uncertainty of initial bias
+sig_u = 9.0E-4 * deg / hr ** 1.5 # bias white noise
+Q1p = (0.00003 * rad) ** 2 / (100.0 * day)
+Qcoef = np.array([0.0, Q1p, 0.0, 0.0]) # cubic process noise coefficients
+minang = 30.0 # minimum maneuver angle for processing (deg)
+P0 = 1.0E-9
+Px0 = np.eye(9) * P0 # initial state vector covariance
+x0 = np.array([3.32e-6, -1.39e-4, -3.90e-5,
+               9.32e-5, -1.38e-5,  4.58e-6,
+               1.38e-5,  9.83e-6,  3.37e-6]) # initial state vector, M-matrix row ordered
+
+# Times of reset (e.g. IRU turned off) seconds from J2000 UTC (2000:001:12:00:00)
+reset_J2000sec = np.array([585910800.0, # IRU-2 made operational
+                           836697600.0, # mid-safe mode 2011:187:12:28:47 to 2011:192:03:54:30
+                           864950400.0]) - 473342400.0 # mid-safe mode 2012:150:03:33:29 to 2012:152
+
+def datenumsecs(year, doy, hrs, mins, secs):
+    """Function to compute seconds from 2000:001:12:00:00 without leap seconds,
+       as differences of MATLAB datenum
+    """
+    t = datetime.datetime(year, 1, 1) + datetime.timedelta(days=doy - 1, hours=hrs,
+                                                           minutes=mins, seconds=secs)
+    dt = t - datetime.datetime(2000, 1, 1, 12)
+    return dt.days * 86400.0 + dt.seconds + dt.microseconds * 1e-6
+
+def datesecs(date):
+    """Function to compute seconds from 2000:001:12:00:00 without leap seconds
+       of a date YYYY:DOY:HH:MM:SS.sss, as datenumsecs
+    """
+    (year, doy, hrs, mins, secs) = date.split(':')
+    return datenumsecs(int(year), int(doy), int(hrs), int(mins), float(secs))
+
+# Uplinked M-matrix calibrations (row ordered as the state vector), in seconds of datesecs
+mmat_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'mmat_history.dat')
+mmat_history = MmatHistory(mmat_file, datesecs)
+
+def rcov(dur):
+    """Function to compute IRU noise variance per axis for maneuver durations
+       Input  dur : array(num,) of maneuver durations (sec)
+       Output array(num,) of variances (rad^2)
+    """
+    return sig_d ** 2 + sig_v ** 2 * dur + sig_b ** 2 * dur ** 2 + sig_u ** 2 * dur ** 3
+
+def qprocess(stop_J2000sec, start_J2000sec):
+    """Function to compute the process noise between maneuvers
+       Input  stop_J2000sec  : array(num,) stop times of previous maneuvers
+              start_J2000sec : array(num,) start times of next maneuvers
+       Output Q : array(num,) process noise variance per state, and
+              reset : bool array(num,); True for a reset between the
+                      maneuvers, for which the covariance is Px0 instead
+    """
+    reset = ((stop_J2000sec[:, np.newaxis] < reset_J2000sec) &
+             (reset_J2000sec < start_J2000sec[:, np.newaxis])).any(axis=1)
+    dur = np.abs(start_J2000sec - stop_J2000sec)
+    Q = Qcoef[0] + Qcoef[1] * dur + Qcoef[2] * dur ** 2 + Qcoef[3] * dur ** 3
+    return (Q, reset)
+
+def rightdivide(A, B):
+    """Function to compute A / B = A * inv(B) as MATLAB mrdivide"""
+    return np.linalg.solve(B.T, A.T).T
+
+def quat5(q):
+    """Function to add a time row of zeros to quaternions(4,num)"""
+    return np.vstack((np.zeros(q.shape[1]), q))
+
+def pycal10(arrays, matflag=False, min_ang=minang, mmathist=None):
+    """Function to compute the 9-parameter IRU calibration with the Davenport
+       forward/backward Kalman filter of matpycal10.m
+       Input  arrays  : dict of arrays from iruout.iruarrays (or the npz file),
+                        using start_J2000sec, stop_J2000sec, initquat,
+                        finalquat, manvrquat, ini2fintim, ini2finang, sumproprot
+              matflag : True to give results relative to the on-board M-matrix
+              min_ang : minimum maneuver angle (deg)
+              mmathist : MmatHistory of the on-board M-matrix in seconds of
+                         datesecs, None for mmat_history (mmat_history.dat)
+       Output res : dict with
+                    idx    : bool array of maneuvers used (angle >= min_ang)
+                    x      : array(9,num) smoothed state, M-matrix row ordered
+                             (D-matrix if matflag)
+                    Px     : array(9,9,num) smoothed state covariance
+                    manerr : array(3,num) residual maneuver errors (rad)
+                    Mmat   : array(3,3) result reported by matpycal10.m, from
+                             the next to last maneuver
+                    Dmat   : array(3,3) Mmat relative to the on-board M-matrix
+                             (if matflag)
+    """
+#   eliminate maneuvers less than min_ang
+    idx = (arrays['ini2finang'][0, :] >= min_ang)
+    start_J2000sec = arrays['start_J2000sec'][idx, 0]
+    stop_J2000sec = arrays['stop_J2000sec'][idx, 0]
+    initquat = quat5(arrays['initquat'][:, idx])
+    finalquat = quat5(arrays['finalquat'][:, idx])
+    manvrquat = quat5(arrays['manvrquat'][:, idx])
+    dur = arrays['ini2fintim'][0, idx] # duration of maneuver
+    H = arrays['sumproprot'][idx, :, :] # (num,3,9) observation matrices
+    num = H.shape[0]
+
+#   measurement noise and delta vectors of all maneuvers
+    manvrmat = quat2mats(manvrquat).transpose(2, 0, 1) # rotation matrix from init to final
+    attcov = Patt + np.einsum('nij,jk,nlk->nil', manvrmat, Patt, manvrmat) # init and final att covar
+    R = rcov(dur)[:, np.newaxis, np.newaxis] * np.eye(3) + attcov
+    rotatequat = quatmult(quatconj(initquat), finalquat) # rotate quat from pcad att
+    zee = quat2vect(quatmult(quatconj(manvrquat), rotatequat))[1:, :] # delta vector
+
+#   process noise between maneuvers
+    (Qscale, reset) = qprocess(stop_J2000sec[:-1], start_J2000sec[1:])
+
+#   forward filter, first maneuver without process noise
+    x = np.zeros((9, num)) # state vector
+    Px = np.zeros((9, 9, num)) # state vector covariance
+    manerr = np.zeros((3, num)) # residual maneuver error
+    xn = x0.copy()
+    Pn = Px0.copy()
+    for n in range(num):
+        if (n > 0):
+            Pn = Pn + (Px0 if reset[n - 1] else Qscale[n - 1] * np.eye(9)) # covariance propagation
+        Hn = H[n]
+        Kg = rightdivide(np.dot(Pn, Hn.T), np.dot(np.dot(Hn, Pn), Hn.T) + R[n]) # Kalman gain
+        xn = xn + np.dot(Kg, zee[:, n] - np.dot(Hn, xn)) # update state
+        Pn = np.dot(np.eye(9) - np.dot(Kg, Hn), Pn) # update covariance
+        x[:, n] = xn
+        Px[:, :, n] = Pn
+        manerr[:, n] = zee[:, n] - np.dot(Hn, xn) # residual error
+
+#   backward filter; as matpycal10.m, the attitude covariance uses the
+#   maneuver matrix of the last maneuver
+    Rb = rcov(dur)[:, np.newaxis, np.newaxis] * np.eye(3) + attcov[-1]
+    xb = x[:, -1].copy()
+    Pxb = Px[:, :, -1].copy()
+    for n in range(num - 2, -1, -1):
+        xf = x[:, n].copy() # forward state at time tn
+        Pxf = Px[:, :, n].copy() # forward covariance at time tn
+        Pxb = Pxb + (Px0 if reset[n] else Qscale[n] * np.eye(9)) # propagate backwards cov
+        Wf = rightdivide(Pxb, Pxf + Pxb) # forward weight
+        Wb = rightdivide(Pxf, Pxf + Pxb) # backward weight
+        x[:, n] = np.dot(Wf, xf) + np.dot(Wb, xb) # combine forward and backward states
+        Px[:, :, n] = np.dot(rightdivide(Pxf, Pxf + Pxb), Pxb) # smoothed covariance
+        Hn = H[n]
+        manerr[:, n] = zee[:, n] - np.dot(Hn, x[:, n]) # residual error
+        Kg = rightdivide(np.dot(Pxb, Hn.T), np.dot(np.dot(Hn, Pxb), Hn.T) + Rb[n]) # Kalman gain
+        xb = xb + np.dot(Kg, zee[:, n] - np.dot(Hn, xb)) # update backward state
+        Pxb = Pxb - np.dot(np.dot(Kg, Hn), Pxb) # update backward covariance
+
+    res = {'idx': idx, 'x': x, 'Px': Px, 'manerr': manerr,
+           'Mmat': x[:, -2].reshape(3, 3).copy()}
+
+#   adjust relative to on-board M-matrix, D = (I + M) / (I + Mmat) - I
+    if matflag:
+        if mmathist is None:
+            mmathist = mmat_history
+        epochs = mmathist.epochs(stop_J2000sec)
+        Mmats = mmathist.gather(stop_J2000sec)
+        for n in np.flatnonzero(epochs >= 0):
+            D = rightdivide(np.eye(3) + x[:, n].reshape(3, 3),
+                            np.eye(3) + Mmats[:, :, n]) - np.eye(3)
+            x[:, n] = D.ravel()
+        res['Dmat'] = x[:, -2].reshape(3, 3).copy()
+    return res
+
+if __name__ == '__main__':
+#   run with npz file written by getirudata33c.py, e.g.
+#   python pycal10.py getirudata_i99_v33c.npz [matflag]
+    arrays = dict(np.load(sys.argv[1]))
+    matflag = (len(sys.argv) > 2) and (sys.argv[2].lower() in ('t', 'true', 'y'))
+    res = pycal10(arrays, matflag)
+    print 'Number of maneuvers = %d' % res['idx'].sum()
+    print 'Output last result of Davenport F/B 9-parameter filter'
+    print 'Mmat = '
+    for row in res['Mmat']:
+        print '  %16.8e  %16.8e  %16.8e' % tuple(row)
+    if matflag:
+        print 'Dmat = '
+        for row in res['Dmat']:
+            print '  %16.8e  %16.8e  %16.8e' % tuple(row)
+    yzerr = res['manerr'][1, :] ** 2 + res['manerr'][2, :] ** 2
+    print 'RMS YZ resid error = %9.3f asec' % (np.sqrt(yzerr.mean()) / asec)
@@ -1,9 +1,149 @@
 # Quaternion function definitions
 # from quatdefs import *
+#
+# Kernels (qmult, qconj, qnorm, rotvec2q, q2rotvec, q2rotmats, q2xaxis) work
+# on quaternions q(4,num) = x, y, z, w and vectors v(3,num) without a time
+# row, for (num,4) arrays pass the transpose view.  Inputs are not copied,
+# and results are written to the out array when given.  The functions on
+# the 5-row layout with q[0,] = time (quatmult, quatconj, ...) carry the
+# time row separately and compute with the kernels.
 
-import Ska.Numpy 
-from pylab import *
-from math import *
+import numpy as np
+
+# product terms of q1 * q2 for each row, (sign, q1 row, q2 row)
+multterms = [[( 1, 3, 0), (-1, 2, 1), ( 1, 1, 2), ( 1, 0, 3)],
+             [( 1, 2, 0), ( 1, 3, 1), (-1, 0, 2), ( 1, 1, 3)],
+             [(-1, 1, 0), ( 1, 0, 1), ( 1, 3, 2), ( 1, 2, 3)],
+             [(-1, 0, 0), (-1, 1, 1), (-1, 2, 2), ( 1, 3, 3)]]
+
+def outarray(out, shape):
+    """Function to return out, or a new array of shape if out is None"""
+    if out is None:
+        return np.empty(shape)
+    return out
+
+def sumsq3(v):
+    """Function to return x*x + y*y + z*z of the first three rows of v"""
+    s = v[0, ] * v[0, ]
+    s += v[1, ] * v[1, ]
+    s += v[2, ] * v[2, ]
+    return s
+
+def qmult(q1, q2, out=None):
+    """Function to multiply arrays of quaternions
+       Input q1, q2 : quaternions(4) or (4,num)
+             out    : optional array(4,num) for the result, may be q1 or q2
+       Output q3 : quaternions(4,num), q3 = q1*q2
+    """
+    q1 = q1.reshape(4, -1)
+    q2 = q2.reshape(4, -1)
+    num = max(q1.shape[1], q2.shape[1])
+    q3 = outarray(out, (4, num))
+    if np.may_share_memory(q3, q1) or np.may_share_memory(q3, q2):
+        q3[...] = qmult(q1, q2)
+        return q3
+    work = np.empty(num)
+    for (row, terms) in enumerate(multterms):
+        (sign, i, j) = terms[0]
+        np.multiply(q1[i, ], q2[j, ], out=q3[row, ])
+        if (sign < 0):
+            np.negative(q3[row, ], out=q3[row, ])
+        for (sign, i, j) in terms[1:]:
+            np.multiply(q1[i, ], q2[j, ], out=work)
+            if (sign < 0):
+                q3[row, ] -= work
+            else:
+                q3[row, ] += work
+    return q3
+
+def qconj(q, out=None):
+    """Function to return conjugates of an array of quaternions
+       Input q : quaternions(4,num); out : optional array(4,num), may be q
+       Output p : quaternions(4,num)
+    """
+    q = q.reshape(4, -1)
+    p = outarray(out, q.shape)
+    np.negative(q[0:3, ], out=p[0:3, ])
+    p[3, ] = q[3, ]
+    return p
+
+def qnorm(q, out=None):
+    """Function to normalize an array of quaternions, with w >= 0
+       Input q : quaternions(4,num); out : optional array(4,num), may be q
+       Output p : quaternions(4,num)
+    """
+    q = q.reshape(4, -1)
+    p = outarray(out, q.shape)
+    qmag = sumsq3(q)
+    qmag += q[3, ] * q[3, ]
+    np.sqrt(qmag, out=qmag)
+    np.divide(q, qmag, out=p)
+    np.negative(p, out=p, where=(p[3, ] < 0.0))
+    return p
+
+def rotvec2q(v, out=None):
+    """Function to convert an array of rotation vectors to quaternions
+       Input v : vectors(3,num); out : optional array(4,num)
+       Output q : quaternions(4,num)
+    """
+    v = v.reshape(3, -1)
+    q = outarray(out, (4, v.shape[1]))
+    vmag = np.sqrt(sumsq3(v))
+    small = (vmag < 0.0000001)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        np.divide(v, vmag, out=q[0:3, ])
+    q[0:3, ] *= np.sin(vmag / 2.0)
+    np.cos(vmag / 2.0, out=q[3, ])
+    if small.any():
+        q[0:3, small] = v[:, small] / 2.0
+        q[3, small] = np.sqrt(1.0 - vmag[small] * vmag[small] / 4.0)
+    return q
+
+def q2rotvec(q, out=None):
+    """Function to convert an array of quaternions to rotation vectors
+       Input q : quaternions(4,num); out : optional array(3,num)
+       Output v : vectors(3,num)
+    """
+    q = q.reshape(4, -1)
+    v = outarray(out, (3, q.shape[1]))
+    sinhalfang = np.sqrt(sumsq3(q)) # sine of half rotation angle
+    angle = 2.0 * np.arctan2(sinhalfang, q[3, ])
+    np.multiply(q[0:3, ], 2.0, out=v)
+    big = (angle >= 0.0000001)
+    v[:, big] = q[0:3, big] / sinhalfang[big] * angle[big]
+    return v
+
+def q2rotmats(q, out=None):
+    """Function to convert an array of quaternions to rotation matrices
+       Input q : quaternions(4,num); out : optional array(3,3,num)
+       Output M : matrices(3,3,num)
+    """
+    q = q.reshape(4, -1)
+    M = outarray(out, (3, 3, q.shape[1]))
+    (x, y, z, w) = q
+    M[0, 0, ] =  x * x - y * y - z * z + w * w
+    M[0, 1, ] =  2.0 * (x * y + z * w)
+    M[0, 2, ] =  2.0 * (x * z - y * w)
+    M[1, 0, ] =  2.0 * (x * y - z * w)
+    M[1, 1, ] = -x * x + y * y - z * z + w * w
+    M[1, 2, ] =  2.0 * (y * z + x * w)
+    M[2, 0, ] =  2.0 * (x * z + y * w)
+    M[2, 1, ] =  2.0 * (y * z - x * w)
+    M[2, 2, ] = -x * x - y * y + z * z + w * w
+    return M
+
+def q2xaxis(q, out=None):
+    """Function to compute the X-axes of an array of attitude quaternions
+       Input q : quaternions(4,num); out : optional array(3,num)
+       Output X : vectors(3,num), first row of the rotation matrix
+    """
+    q = q.reshape(4, -1)
+    X = outarray(out, (3, q.shape[1]))
+    (x, y, z, w) = q
+    X[0, ] = x * x - y * y - z * z + w * w
+    X[1, ] = 2.0 * (x * y + z * w)
+    X[2, ] = 2.0 * (x * z - y * w)
+    return X
 
 def vectmag(v):
     """function to compute magnitude of vector
@@ -24,13 +164,11 @@ def quatnorm(q):
        Input q : quaternion(5) with q[0] = time
        Output q : normalized quaternion
     """
-    q = q.copy()
     q = q.reshape(5, -1)
-    qmag = vectmag(q[1:, ])
-    q[1:, ] = q[1:, ] / qmag
-    idx = find(q[4, ] < 0.0)
-    q[1:, idx] = -q[1:, idx]
-    return (q)
+    p = np.empty(q.shape)
+    p[0, ] = q[0, ]
+    qnorm(q[1:, ], out=p[1:, ])
+    return (p)
 
 def quatmult(q1, q2):
     """Function to multiply two quaternions
@@ -39,19 +177,14 @@ def quatmult(q1, q2):
        q3[0] = q2[0]
        q3[1] =  q1[4]*q2[1] - q1[3]*q2[2] + q1[2]*q2[3] + q1[1]*q2[4]
        q3[2] =  q1[3]*q2[1] + q1[4]*q2[2] - q1[1]*q2[3] + q1[2]*q2[4]
-       q3[3] = -q1[2]*q2[1] + q1[1]*q2[2] + q1[4]*q2[3] + q1[3]*q2[4] 
+       q3[3] = -q1[2]*q2[1] + q1[1]*q2[2] + q1[4]*q2[3] + q1[3]*q2[4]
        q3[4] = -q1[1]*q2[1] - q1[2]*q2[2] - q1[3]*q2[3] + q1[4]*q2[4]
     """
-    q1 = q1.copy()
     q1 = q1.reshape(5, -1)
-    q2 = q2.copy()
     q2 = q2.reshape(5, -1)
-    q3 = zeros(q2.shape)
-    q3[0, ] =  q2[0, ]
-    q3[1, ] =  q1[4, ] * q2[1, ] - q1[3, ] * q2[2, ] + q1[2, ] * q2[3, ] + q1[1, ] * q2[4, ]
-    q3[2, ] =  q1[3, ] * q2[1, ] + q1[4, ] * q2[2, ] - q1[1, ] * q2[3, ] + q1[2, ] * q2[4, ]
-    q3[3, ] = -q1[2, ] * q2[1, ] + q1[1, ] * q2[2, ] + q1[4, ] * q2[3, ] + q1[3, ] * q2[4, ] 
-    q3[4, ] = -q1[1, ] * q2[1, ] - q1[2, ] * q2[2, ] - q1[3, ] * q2[3, ] + q1[4, ] * q2[4, ]
+    q3 = np.empty((5, max(q1.shape[1], q2.shape[1])))
+    q3[0, ] = q2[0, ]
+    qmult(q1[1:, ], q2[1:, ], out=q3[1:, ])
     return (q3)
 
 def quatconj(q):
@@ -64,29 +197,21 @@ def quatconj(q):
        q[3] = -q[3]
        q[4] =  q[4]
     """
-    q = q.copy()
     q = q.reshape(5, -1)
-    q[0, ] =  q[0, ]
-    q[1:4, ] = -q[1:4, ]
-    q[4, ] =  q[4, ]
-    return (q)
+    p = np.empty(q.shape)
+    p[0, ] = q[0, ]
+    qconj(q[1:, ], out=p[1:, ])
+    return (p)
 
 def vect2quat(v):
     """Function to convert a rotation vector to a quaternion
        Input v : vector(4,num) with v[0,] = time
        Output q : quaternion(5,num) with q[0,] = time
     """
-    v = v.copy()
     v = v.reshape(4, -1)
-    q = zeros((5,v.shape[1]))
+    q = np.empty((5, v.shape[1]))
     q[0, ] = v[0, ]
-    vmag = vectmag(v[1:, ])
-    idx = find(vmag < 0.0000001)  
-    q[1:4, idx] = v[1:4, idx] / 2.0
-    q[4, idx] = np.sqrt(1.0 - vmag[idx] * vmag[idx] / 4.0)
-    idx = find(vmag >= 0.0000001)  
-    q[1:4, idx] = (v[1:4, idx] / vmag[idx]) * np.sin(vmag[idx] / 2.0)
-    q[4, idx] = np.cos(vmag[idx] / 2.0)
+    rotvec2q(v[1:, ], out=q[1:, ])
     return (q)
 
 def quat2vect(q):
@@ -94,35 +219,123 @@ def quat2vect(q):
        Input q : quaternion(5,1) with q[0,] = time
        Output v : vector(4,1) with v[0,] = time
     """
-    q = q.copy()
     q = q.reshape(5, -1)
-    v = zeros(q.shape)
+    v = np.empty((4, q.shape[1]))
     v[0, ] = q[0, ]
-    sinhalfang = vectmag(q[1:4, ]) # sine of half rotation angle
-    angle = 2.0 * np.arctan2(sinhalfang,q[4, ])
-    v[1:4, ] = 2.0 * q[1:4, ]
-    idx = find(angle >= 0.0000001)
-    v[1:4, idx] = q[1:4, idx] / sinhalfang[idx] * angle[idx]
-    return (v[0:4, ])
+    q2rotvec(q[1:, ], out=v[1:, ])
+    return (v)
 
 def quat2mat(q):
     """function to convert quaternion to matrix
        Input Q : quaternion(5)
        Output M : matrix(3x3)
     """
-    q = q.copy()
-    q = q.reshape(5, -1)
-    M = zeros((3,3))
-    M[0, 0] =  q[1, ] * q[1, ] - q[2, ] * q[2, ] - q[3, ] * q[3, ] + q[4, ] * q[4, ]
-    M[0, 1] =  2.0 * (q[1, ] * q[2, ] + q[3, ] * q[4, ])
-    M[0, 2] =  2.0 * (q[1, ] * q[3, ] - q[2, ] * q[4, ])
-    M[1, 0] =  2.0 * (q[1, ] * q[2, ] - q[3, ] * q[4, ])
-    M[1, 1] = -q[1, ] * q[1, ] + q[2, ] * q[2, ] - q[3, ] * q[3, ] + q[4, ] * q[4, ]
-    M[1, 2] =  2.0 * (q[2, ] * q[3, ] + q[1, ] * q[4, ])
-    M[2, 0] =  2.0 * (q[1, ] * q[3, ] + q[2, ] * q[4, ])
-    M[2, 1] =  2.0 * (q[2, ] * q[3, ] - q[1, ] * q[4, ])
-    M[2, 2] = -q[1, ] * q[1, ] - q[2, ] * q[2, ] + q[3, ] * q[3, ] + q[4, ] * q[4, ]
-    return (M)
+    return (q2rotmats(q.reshape(5, -1)[1:, 0])[:, :, 0])
+
+def quat2mats(q):
+    """function to convert an array of quaternions to an array of matrices
+       Input q : quaternion(5,num)
+       Output M : matrix(3,3,num), M[:, :, n] = quat2mat(q[:, n])
+    """
+    return (q2rotmats(q.reshape(5, -1)[1:, ]))
+
+def quatcumprod(q, block=None, num_threads=1):
+    """Function to compute the running product of an array of quaternions
+       by recursive doubling, log2(num) array multiplications, or by the
+       blocked scan of qscan if block is given
+       Input q : quaternion(5,num) with q[0,] = time
+             block : None for recursive doubling, else qscan block size
+             num_threads : number of threads for qscan
+       Output p : quaternion(5,num), p[:, k] = q[:, 0] * q[:, 1] * ... * q[:, k]
+                  normalized, with p[0,] = q[0,]
+    """
+    p = np.array(q.reshape(5, -1))
+    if block is not None:
+        qscan(p[1:, ], block, num_threads=num_threads, out=p[1:, ])
+        return (p)
+    num = p.shape[1]
+    work = np.empty((4, num))
+    shift = 1
+    while (shift < num):
+        qmult(p[1:, :-shift], p[1:, shift:], out=work[:, shift:])
+        qnorm(work[:, shift:], out=p[1:, shift:])
+        shift = 2 * shift
+    qnorm(p[1:, ], out=p[1:, ])
+    return (p)
+
+def qscan(q, block=32, renorm=8, num_threads=1, out=None):
+    """Function to compute the running products of an array of quaternions
+       by a blocked scan: the running products within blocks of block
+       quaternions are computed for all blocks at once, then each block is
+       multiplied by the product of the blocks before it (a qscan of the block
+       products).  The chain of dependent multiplications is about
+       block + num / block long instead of num.
+       Input q : quaternions(4,num)
+             block  : number of quaternions in each block
+             renorm : normalize the running products every renorm quaternions,
+                      0 for no normalization within blocks
+             num_threads : number of threads for the scans within blocks
+             out : optional array(4,num), may be q
+       Output p : quaternions(4,num), p[:, k] = q[:, 0] * q[:, 1] * ... * q[:, k]
+                  normalized
+    """
+    q = q.reshape(4, -1)
+    num = q.shape[1]
+    p = outarray(out, (4, num))
+    numblk = max(1, -(-num // block))
+    w = np.empty((4, numblk * block))
+    w[:, :num] = q
+    w[0:3, num:] = 0.0 # identity quaternions after the last block
+    w[3, num:] = 1.0
+    wblk = w.reshape(4, numblk, block)
+
+    def blockscan(blks):
+        work = np.empty((4, blks.stop - blks.start))
+        for k in range(1, block):
+            qmult(wblk[:, blks, k - 1], wblk[:, blks, k], out=work)
+            if (renorm > 0) and (k % renorm == 0):
+                qnorm(work, out=wblk[:, blks, k])
+            else:
+                wblk[:, blks, k] = work
+
+    if (num_threads > 1) and (numblk > 1):
+        from multiprocessing.pool import ThreadPool
+        edges = np.linspace(0, numblk, min(num_threads, numblk) + 1).astype(int)
+        pool = ThreadPool(len(edges) - 1)
+        pool.map(blockscan, [slice(edges[i], edges[i + 1]) for i in range(len(edges) - 1)])
+        pool.close()
+    else:
+        blockscan(slice(0, numblk))
+
+#   products of all blocks up to each block, applied to the following block
+    if (numblk > 1):
+        blkprod = qscan(wblk[:, :-1, block - 1], block, renorm)
+        qmult(np.repeat(blkprod, block, axis=1), w[:, block:], out=w[:, block:])
+    qnorm(w[:, :num], out=p)
+    return p
+
+def qchain(q, out=None):
+    """Function to compute the running products of an array of quaternions
+       one multiplication at a time, normalized at each step, as a reference
+       for qscan and quatcumprod
+       Input q : quaternions(4,num); out : optional array(4,num), may be q
+       Output p : quaternions(4,num)
+    """
+    q = q.reshape(4, -1)
+    p = outarray(out, q.shape)
+    qnorm(q[:, 0:1], out=p[:, 0:1])
+    for k in range(1, q.shape[1]):
+        qnorm(qmult(p[:, k - 1], q[:, k]), out=p[:, k:k + 1])
+    return p
+
+def qscanerror(q, block=32, renorm=8):
+    """Function to check the precision of qscan against the sequential chain
+       Input q : quaternions(4,num); block, renorm : as qscan
+       Output angle : float; maximum rotation angle between the qscan and
+                      qchain running products (rad)
+    """
+    dq = qmult(qconj(qchain(q)), qscan(q, block, renorm))
+    return (np.sqrt(sumsq3(q2rotvec(dq))).max())
 
 def quatxaxis(q):
     """Function to compute the X-axis of an attitude quaternion.
@@ -131,15 +344,12 @@ def quatxaxis(q):
        Input q : q(5,num), where q(0,num) is time and q(1:,num) is quaternion
        Output X : X(4,num), where X(0,num) is time and X(1:,num) is 3-vector
     """
-    q = q.copy()
     q = q.reshape(5, -1)
-    X = zeros(q.shape)
+    X = np.empty((4, q.shape[1]))
     X[0, ] = q[0, ]
-    X[1, ] = q[1, ] * q[1, ] - q[2, ] * q[2, ] - q[3, ] * q[3, ] + q[4, ] * q[4, ]
-    X[2, ] = 2.0 * (q[1, ] * q[2, ] + q[3, ] * q[4, ])
-    X[3, ] = 2.0 * (q[1, ] * q[3, ] - q[2, ] * q[4, ])
-    return (X[0:4, ])
-    
+    q2xaxis(q[1:, ], out=X[1:, ])
+    return (X)
+
 def crossprod(a,b):
     """Function to compute the cross products of each vector of two vector
        arrays in sequential order.
@@ -147,32 +357,60 @@ def crossprod(a,b):
               b(4,num) : vector array with b[0,:] as time and b[1:,:] as 3-vector
        Output c(4,num) : vector array with c[0,:] as time and c[1:,:] as 3-vector
     """
-    a = a.copy()
     a = a.reshape(4, -1)
-    b = b.copy()
     b = b.reshape(4, -1)
-    c = zeros(a.shape)
+    c = np.empty(a.shape)
     c[0, ] = a[0, ]
     c[1, ] = a[2, ] * b[3, ] - a[3, ] * b[2, ]
     c[2, ] = a[3, ] * b[1, ] - a[1, ] * b[3, ]
     c[3, ] = a[1, ] * b[2, ] - a[2, ] * b[1, ]
     return(c)
 
-def quatxaber(q,v):
+def lagrange4(data, times):
+    """Function to interpolate time series with 4-point Lagrange polynomials
+       for all interpolation times at once.  Times in (t[m-1], t[m]] use the
+       samples m-2 to m+1, for m = 2 to num-2.
+       Input  data(rows,num): where data[0,:] is time, ascending, and
+                              data[1:,:] are the values of each series
+              times(numt)   : interpolation times
+       Output d(rows,numt): where d[0,:] is times and d[1:,:] are interpolated
+                            values, zero for times outside (t[1], t[num-2]]
+    """
+    data = data.reshape(data.shape[0], -1)
+    num = data.shape[1]
+    d = np.zeros((data.shape[0], times.shape[0]))
+    d[0, ] = times
+    m = np.searchsorted(data[0, ], times, 'left')
+    idx = np.flatnonzero((m >= 2) & (m <= num - 2))
+    nodes = m[idx] + np.arange(-2, 2)[:, np.newaxis] # sample indices, (4,len(idx))
+    t = data[0, nodes] - data[0, 0]
+    x = times[idx] - data[0, 0]
+    for j in range(4):
+        w = np.ones(idx.shape[0]) # Lagrange basis polynomial of sample j
+        for i in range(4):
+            if (i != j):
+                w = w * (x - t[i, ]) / (t[j, ] - t[i, ])
+        d[1:, idx] = d[1:, idx] + data[1:, nodes[j, ]] * w
+    return(d)
+
+def quatxaber(q,v,interp=False):
     """Function to adjust an attitude quaternion for stellar aberration, when
-       the stars used to compute the quaternion are not compensated for 
+       the stars used to compute the quaternion are not compensated for
        stellar aberration and are clustered around the X-axis.
        Input  q(5,num): where q[0,:] is time and q[1:,:] is quaternion
               v(4,num): where v[0,:] is time and v[1:,:] is velocity (km/sec)
+              interp  : True if v is a velocity ephemeris at its own times,
+                        interpolated to the quaternion times with lagrange4
        Output q(5,num): where q[0,:] is time and q[1:,:] is adjusted quaternion
     """
-    q = q.copy()
     q = q.reshape(5, -1)
-    v = v.copy()
-    v = v.reshape(4, -1)
+    if interp:
+        v = lagrange4(v, q[0, ])
+    else:
+        v = v.reshape(4, -1)
     sol = 299792.458 # speed of light (km/sec)
     x = quatxaxis(q)
     aberadj = vect2quat(crossprod(x,v/sol))
     q = quatmult(aberadj,q)
     return(q)
-    
+
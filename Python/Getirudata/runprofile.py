@@ -0,0 +1,186 @@
+# runprofile.py
+# Timing of a getirudata run: stages are timed one after another with lap,
+# so the stage times add up to the run time, and timers within stages
+# (archive fetches, maneuver computations in the worker processes) are
+# accumulated with timer.  Fetched samples & bytes are counted per MSID.
+# The report is a table of stages & timers and a JSON file.
+
+import os
+import time
+import json
+import cProfile
+import pstats
+import numpy as np
+
+class NullTimer(object):
+    """Context manager doing nothing, the timer of NullProfile
+    """
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        return False
+
+class Timer(object):
+    """Context manager adding its elapsed time to timer name of a Profile
+    """
+    def __init__(self, profile, name):
+        self.profile = profile
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.profile.add(self.name, time.time() - self.t0)
+        return False
+
+class Profile(object):
+    """Stage times, timers, counters and fetched data per MSID of a run
+       stages   : list of [name, sec] in order of first lap
+       timers   : dict of [sec, calls] keyed by name
+       counters : dict of counts keyed by name
+       msids    : dict of [calls, samples, bytes] keyed by MSID
+    """
+    def __init__(self):
+        self.stages = []
+        self.timers = {}
+        self.counters = {}
+        self.msids = {}
+        self.tstart = time.time()
+        self.tlap = self.tstart
+
+    def lap(self, name):
+        """Function to add the time since the last lap (or start) to stage name
+        """
+        t = time.time()
+        for stage in self.stages:
+            if (stage[0] == name):
+                stage[1] += t - self.tlap
+                break
+        else:
+            self.stages.append([name, t - self.tlap])
+        self.tlap = t
+
+    def timer(self, name):
+        """Function to return a context manager timing its block in timer name
+        """
+        return Timer(self, name)
+
+    def add(self, name, sec, calls=1):
+        timer = self.timers.setdefault(name, [0.0, 0])
+        timer[0] += sec
+        timer[1] += calls
+
+    def count(self, name, num=1):
+        self.counters[name] = self.counters.get(name, 0) + num
+
+    def addfetch(self, data):
+        """Function to count the samples & bytes of a fetched dict of MSIDs
+        """
+        for (msid, msiddata) in data.items():
+            times = np.asarray(msiddata.times)
+            vals = np.asarray(msiddata.vals)
+            counts = self.msids.setdefault(msid, [0, 0, 0])
+            counts[0] += 1
+            counts[1] += times.shape[0]
+            counts[2] += times.nbytes + vals.nbytes
+
+    def merge(self, timers):
+        """Function to add timers of another profile, e.g. of a worker process
+           Input  timers : dict of [sec, calls] keyed by name
+        """
+        for (name, (sec, calls)) in timers.items():
+            self.add(name, sec, calls)
+
+    def todict(self):
+        total = time.time() - self.tstart
+        return dict(total=total,
+                    stages=[dict(name=name, sec=sec) for (name, sec) in self.stages],
+                    timers=dict((name, dict(sec=sec, calls=calls))
+                                for (name, (sec, calls)) in self.timers.items()),
+                    counters=self.counters,
+                    msids=dict((msid, dict(calls=calls, samples=samples, bytes=nbytes))
+                               for (msid, (calls, samples, nbytes)) in self.msids.items()))
+
+    def table(self):
+        """Function to format the profile as a table
+           Output list of lines
+        """
+        total = time.time() - self.tstart
+        lines = ['%-24s %10s %7s' % ('stage', 'sec', '%')]
+        for (name, sec) in self.stages:
+            lines.append('%-24s %10.3f %7.1f' % (name, sec, 100.0 * sec / max(total, 1e-9)))
+        lines.append('%-24s %10.3f' % ('total', total))
+        lines.append('%-24s %10s %7s  (within stages, summed over processes)'
+                     % ('timer', 'sec', 'calls'))
+        for name in sorted(self.timers):
+            (sec, calls) = self.timers[name]
+            lines.append('%-24s %10.3f %7d' % (name, sec, calls))
+        if self.counters:
+            lines.append('%-24s %10s' % ('counter', 'count'))
+        for name in sorted(self.counters):
+            lines.append('%-24s %10d' % (name, self.counters[name]))
+        lines.append('%-24s %10s %10s %12s' % ('msid', 'calls', 'samples', 'bytes'))
+        for msid in sorted(self.msids):
+            lines.append('%-24s %10d %10d %12d' % ((msid, ) + tuple(self.msids[msid])))
+        return lines
+
+    def write(self, filename, **info):
+        """Function to write the profile and info items to a JSON file
+        """
+        out = self.todict()
+        out.update(info)
+        tmpname = filename + '.tmp'
+        with open(tmpname, 'w') as f:
+            json.dump(out, f, indent=1, sort_keys=True)
+        os.rename(tmpname, filename)
+
+class NullProfile(object):
+    """Profile recording nothing, for calls without profiling
+    """
+    timers = {}
+
+    def timer(self, name):
+        return NullTimer()
+
+noprofile = NullProfile()
+
+class ProfileFetcher(object):
+    """Fetcher timing each MSIDset call in timer fetch and counting the
+       fetched samples & bytes per MSID
+       Input  fetcher : object with an MSIDset function, fetch or a FetchCache
+              profile : Profile
+    """
+    def __init__(self, fetcher, profile):
+        self.fetcher = fetcher
+        self.profile = profile
+
+    def MSIDset(self, msids, tstart, tstop, filter_bad=False):
+        with self.profile.timer('fetch'):
+            data = self.fetcher.MSIDset(msids, tstart, tstop, filter_bad=filter_bad)
+        self.profile.addfetch(data)
+        return data
+
+def startcprofile(enabled):
+    """Function to start a cProfile profiler if enabled
+       Output cProfile.Profile, None if not enabled
+    """
+    if not enabled:
+        return None
+    cprof = cProfile.Profile()
+    cprof.enable()
+    return cprof
+
+def stopcprofile(cprof, filename, num=20):
+    """Function to stop a cProfile profiler, write its statistics to filename
+       (for pstats or snakeviz) and print the num functions of largest
+       cumulative time; nothing if cprof is None
+    """
+    if cprof is None:
+        return
+    cprof.disable()
+    cprof.dump_stats(filename)
+    print 'cProfile statistics file = %s' % filename
+    pstats.Stats(filename).sort_stats('cumulative').print_stats(num)